@@ -0,0 +1,37 @@
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from apps.users.cache.user_cache import user_cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves the token user from the user cache
+    and only queries the database on a miss.
+
+    Only active users are cached, and deactivating a user drops its entry,
+    so cached users skip the `is_active` check; the revocation check still
+    runs against the cached password hash.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        elif api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
+        return user
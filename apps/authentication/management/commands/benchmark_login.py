@@ -0,0 +1,88 @@
+import asyncio
+import json
+import os
+import shutil
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.default.benchmark import benchmark_catalog, percentile, request, running_server
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure login throughput and product read latency during a login '
+        'storm, with passwords hashed on the request threads and in the '
+        'hashing pool, against gunicorn. Needs gunicorn installed.'
+    )
+
+    password = 'benchmark-password'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--login-clients', type=int, default=32)
+        parser.add_argument('--read-clients', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--workers', type=int, default=1,
+                            help='gunicorn worker processes.')
+        parser.add_argument('--threads', type=int, default=16,
+                            help='Threads of every gunicorn worker.')
+        parser.add_argument('--hash-workers', type=int, default=2,
+                            help='Hashing processes of every gunicorn worker in the pool run.')
+
+    def handle(self, *args, **options):
+        if shutil.which('gunicorn') is None:
+            raise CommandError('gunicorn is not installed.')
+
+        with benchmark_catalog(200, password=self.password) as user:
+            for name, hash_workers in (('inline', 0), ('pool', options['hash_workers'])):
+                env = {**os.environ, 'PASSWORD_HASHING_WORKERS': str(hash_workers)}
+                with running_server(lambda port: self.server(port, options), env=env) as port:
+                    logins, reads, elapsed = asyncio.run(self.storm(port, user.email, options))
+
+                login_ok = logins.count(200)
+                read_latencies = [latency for code, latency in reads if code == 200]
+                self.stdout.write(
+                    f'{name:>6}: {login_ok / elapsed:.1f} logins/s '
+                    f'({len(logins) - login_ok} rejected), product reads '
+                    f'{len(read_latencies) / elapsed:.0f} req/s, '
+                    f'p50 {percentile(read_latencies, 50) * 1000:.0f}ms, '
+                    f'p99 {percentile(read_latencies, 99) * 1000:.0f}ms'
+                )
+
+    def server(self, port, options):
+        return [
+            sys.executable, '-m', 'gunicorn', 'technical_challenge.wsgi:application',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers']),
+            '--worker-class', 'gthread', '--threads', str(options['threads']),
+            '--log-level', 'warning',
+        ]
+
+    async def storm(self, port, email, options):
+        """
+        Run login clients and product read clients side by side for
+        `duration` seconds. Returns the login status codes, the
+        `(status, latency)` of every read and the elapsed time.
+        """
+        logins, reads = [], []
+        deadline = time.perf_counter() + options['duration']
+        body = json.dumps({'email': email, 'password': self.password})
+
+        async def login_client():
+            while time.perf_counter() < deadline:
+                logins.append(await request(port, 'POST', '/authentication/login/', body))
+
+        async def read_client(index):
+            count = 0
+            while time.perf_counter() < deadline:
+                count += 1
+                started = time.perf_counter()
+                status = await request(port, 'GET', f'/product/?page_size=20&n={index}-{count}')
+                reads.append((status, time.perf_counter() - started))
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(login_client() for _ in range(options['login_clients'])),
+            *(read_client(index) for index in range(options['read_clients'])),
+        )
+        return logins, reads, time.perf_counter() - started
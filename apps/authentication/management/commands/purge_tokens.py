@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the expired outstanding and blacklisted JWT refresh tokens '
+        'in small batches, so the token tables track the live sessions. '
+        'Every batch is its own short transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to pause between batches, to spread the write load.')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = OutstandingToken.objects.filter(expires_at__lte=now)
+        remaining = expired.count()
+        self.stdout.write(f'{remaining} expired tokens to purge')
+
+        started = time.perf_counter()
+        total_outstanding = total_blacklisted = 0
+        while True:
+            batch_started = time.perf_counter()
+            ids = list(expired.order_by('expires_at').values_list('pk', flat=True)
+                       [:options['batch_size']])
+            if not ids:
+                break
+            with transaction.atomic():
+                blacklisted, _ = BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                OutstandingToken.objects.filter(pk__in=ids).delete()
+
+            total_outstanding += len(ids)
+            total_blacklisted += blacklisted
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'Purged {total_outstanding}/{remaining} tokens '
+                f'({total_blacklisted} blacklisted), '
+                f'batch {(time.perf_counter() - batch_started) * 1000:.0f}ms, '
+                f'{total_outstanding / elapsed:.0f} tokens/s'
+            )
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(
+            f'Purged {total_outstanding} outstanding and {total_blacklisted} blacklisted '
+            f'tokens in {time.perf_counter() - started:.1f}s'
+        )
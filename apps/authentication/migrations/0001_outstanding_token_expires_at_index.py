@@ -0,0 +1,31 @@
+from django.db import migrations
+
+# The token_blacklist tables belong to simplejwt, so the index is managed
+# here with plain SQL instead of a model Meta.
+INDEX = 'token_outstanding_expires_idx'
+TABLE = 'token_blacklist_outstandingtoken'
+
+
+def create_index(apps, schema_editor):
+    concurrently = 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+    schema_editor.execute(
+        f'CREATE INDEX {concurrently}IF NOT EXISTS {INDEX} ON {TABLE} (expires_at)')
+
+
+def drop_index(apps, schema_editor):
+    concurrently = 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+    schema_editor.execute(f'DROP INDEX {concurrently}IF EXISTS {INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('token_blacklist', '0012_alter_outstandingtoken_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -1,4 +1,8 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from apps.authentication.tokens.refresh_token import FilteredRefreshToken
 
 
 class AuthenticationSerializer(serializers.Serializer):
@@ -8,3 +12,26 @@ class AuthenticationSerializer(serializers.Serializer):
 
 class LogoutSerializer(serializers.Serializer):
     refresh_token = serializers.CharField()
+
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer that checks the blacklist through the blacklist
+    filter. Rotated tokens are blacklisted with a check of their own, so a
+    token blacklisted by another process still cannot be used twice.
+    """
+    token_class = FilteredRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.rotate()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+
+        return data
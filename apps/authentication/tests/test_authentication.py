@@ -1,7 +1,26 @@
-from django.test import Client, TransactionTestCase
+import io
+import os
+import signal
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from rest_framework import status
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
 
+from apps.authentication.tokens.blacklist_filter import BloomFilter, blacklist_filter
+from apps.authentication.tokens.refresh_token import FilteredRefreshToken
+from apps.users.hashing.password_hasher import PasswordHasher, PasswordHashingBusy, password_hasher
 from apps.users.models.user import User
 
 
@@ -11,6 +30,7 @@ class AuthenticationViewSetTest(TransactionTestCase):
         Set up the test environment by creating a user for testing.
         """
         self.client = Client()
+        blacklist_filter.reset()
         self.user_data = {
             "username": None,
             "first_name": "Kirby",
@@ -82,3 +102,191 @@ class AuthenticationViewSetTest(TransactionTestCase):
         )
         self.assertEqual(
             response.status_code, status.HTTP_401_UNAUTHORIZED, response.data)
+
+    def authenticated_get(self, token):
+        """
+        GET a protected endpoint and return the response and the number of
+        user queries it ran.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/reservation/{uuid.uuid4()}/',
+                                       HTTP_AUTHORIZATION=f'Bearer {token}')
+        user_queries = [query for query in queries if '"users_user"' in query['sql']]
+        return response, len(user_queries)
+
+    def test_authenticated_requests_use_cached_user(self):
+        """
+        Test that the token user is cached until the user changes.
+        """
+        token = self.login_and_get_token()
+        self.assertEqual(self.authenticated_get(token)[1], 1)
+        response, user_queries = self.authenticated_get(token)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(user_queries, 0)
+
+        self.client.patch(f'/user/{self.user.id}/', data={"first_name": "Renamed"},
+                          content_type='application/json')
+        self.assertEqual(self.authenticated_get(token)[1], 1)
+
+        self.user.is_active = False
+        self.user.save()
+        response, _ = self.authenticated_get(token)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_rotated_refresh_token_cannot_be_reused(self):
+        """
+        Test that a rotated refresh token is rejected, even by a process
+        whose blacklist filter has not seen it.
+        """
+        login = self.client.post('/authentication/login/', {
+            "email": self.user_data["email"],
+            "password": self.user_data["password"],
+        }, content_type='application/json')
+        refresh_url = '/authentication/refresh_token/'
+        data = {"refresh": login.data['refresh']}
+
+        response = self.client.post(refresh_url, data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertNotEqual(response.data['refresh'], login.data['refresh'])
+        response = self.client.post(refresh_url, data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # An empty filter stands for a process that missed the blacklist write.
+        blacklist_filter._filter = BloomFilter(10, 0.001)
+        response = self.client.post(refresh_url, data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_blacklist_check_skips_database(self):
+        """
+        Test that tokens missing from the blacklist filter are checked
+        without a query, and blacklisted ones still are.
+        """
+        token = str(FilteredRefreshToken.for_user(self.user))
+        blacklist_filter.rebuild()
+        with self.assertNumQueries(0):
+            FilteredRefreshToken(token)
+
+        FilteredRefreshToken(token).blacklist()
+        with self.assertRaises(TokenError):
+            FilteredRefreshToken(token)
+
+    def test_blacklist_filter_loads_once(self):
+        """
+        Test that concurrent first checks wait for a single blacklist scan,
+        and that warming the filter loads it ahead of them.
+        """
+        load = blacklist_filter._load
+        loads = []
+
+        def counting_load(*args):
+            loads.append(args)
+            time.sleep(0.1)
+            return load(*args)
+
+        def check(_):
+            try:
+                return blacklist_filter.might_contain('unknown')
+            finally:
+                connection.close()
+
+        with mock.patch.object(blacklist_filter, '_load', counting_load):
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(check, range(8)))
+            self.assertEqual(len(loads), 1)
+
+            blacklist_filter.reset()
+            blacklist_filter.warm()
+            self.assertEqual(len(loads), 2)
+            with self.assertNumQueries(0):
+                blacklist_filter.might_contain('unknown')
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000, 0.01)
+        for index in range(1000):
+            bloom.add(f'added-{index}')
+        self.assertTrue(all(bloom.might_contain(f'added-{index}') for index in range(1000)))
+        false_positives = sum(bloom.might_contain(f'missing-{index}') for index in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_purge_expired_tokens(self):
+        """
+        Test that only expired tokens are purged, blacklisted or not.
+        """
+        tokens = [FilteredRefreshToken.for_user(self.user) for _ in range(5)]
+        for token in tokens[:2]:
+            token.blacklist()
+        expired = [str(token['jti']) for token in tokens[1:4]]
+        OutstandingToken.objects.filter(jti__in=expired).update(
+            expires_at=timezone.now() - timedelta(minutes=1))
+
+        call_command('purge_tokens', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(
+            set(OutstandingToken.objects.values_list('jti', flat=True)),
+            {str(tokens[0]['jti']), str(tokens[4]['jti'])},
+        )
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+    def test_login_hashes_in_worker_pool(self):
+        """
+        Test that login checks the password in the hashing pool.
+        """
+        password_hasher.reset_stats()
+        self.login_and_get_token()
+        stats = password_hasher.stats()
+        self.assertEqual((stats['hashed'], stats['rejected']), (1, 0))
+        self.assertGreaterEqual(stats['queue_time_max'], 0)
+
+    @override_settings(PASSWORD_HASHING={'WORKERS': 1, 'MAX_CONCURRENCY': 1, 'QUEUE_TIMEOUT': 0,
+                                         'TIMEOUT': 10, 'NICENESS': 0})
+    def test_password_hashing_concurrency_limit(self):
+        """
+        Test that hashes over the concurrency limit are rejected.
+        """
+        hasher = PasswordHasher()
+        slots = hasher._get_slots()
+        slots.acquire()
+        with self.assertRaises(PasswordHashingBusy):
+            hasher.make_password('secret')
+        slots.release()
+        self.assertTrue(hasher.check_password('secret', hasher.make_password('secret')))
+        self.assertEqual(hasher.stats()['rejected'], 1)
+        hasher.shutdown()
+
+    @override_settings(PASSWORD_HASHING={'WORKERS': 1, 'MAX_CONCURRENCY': 1, 'QUEUE_TIMEOUT': 1,
+                                         'TIMEOUT': 10, 'NICENESS': 0})
+    def test_password_hashing_survives_dead_worker(self):
+        """
+        Test that a killed hashing worker only costs a new pool, and that
+        hashes running over the timeout are rejected.
+        """
+        hasher = PasswordHasher()
+        encoded = hasher.make_password('secret')
+        for pid in list(hasher._get_processes()._processes):
+            os.kill(pid, signal.SIGKILL)
+        self.assertTrue(hasher.check_password('secret', encoded))
+        self.assertEqual(hasher.stats()['rejected'], 0)
+
+        with override_settings(PASSWORD_HASHING={**settings.PASSWORD_HASHING, 'TIMEOUT': 0.001}):
+            with self.assertRaises(PasswordHashingBusy):
+                hasher.check_password('secret', encoded)
+        self.assertEqual(hasher.stats()['rejected'], 1)
+        hasher.shutdown()
+
+    @override_settings(PASSWORD_HASHING={'WORKERS': 1, 'MAX_CONCURRENCY': 2, 'QUEUE_TIMEOUT': 0,
+                                         'BATCH_TIMEOUT': 30, 'TIMEOUT': 10, 'NICENESS': 0})
+    def test_bulk_hashing_interleaves_with_logins(self):
+        """
+        Test that a password checked during a bulk hash waits for a single
+        hash of the batch, not for the whole batch.
+        """
+        hasher = PasswordHasher()
+        encoded = hasher.make_password('secret')
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            batch = executor.submit(hasher.make_passwords, [f'secret-{index}' for index in range(10)])
+            time.sleep(0.2)
+            self.assertTrue(hasher.check_password('secret', encoded))
+            self.assertFalse(batch.done())
+            # The batch waits for slots up to BATCH_TIMEOUT, not QUEUE_TIMEOUT.
+            self.assertEqual(len(batch.result()), 10)
+            self.assertNotIn(None, batch.result())
+        hasher.shutdown()
@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import math
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Fixed-size set membership filter. `might_contain` never answers False
+    for an added item, and answers True for a missing one with a
+    probability of about `error_rate` while at most `capacity` items were
+    added.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(round(self.size / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, item):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def might_contain(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self.positions(item))
+
+    def positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + index * second) % self.size for index in range(self.hash_count)]
+
+
+class BlacklistFilter:
+    """
+    Per-process Bloom filter of the blacklisted token ids, so checking a
+    token that is not blacklisted costs no query.
+
+    The filter is loaded from the blacklist when the server process boots
+    (see `warm`), or on first use, and updated by every blacklist write of
+    this process. Loads are serialized, so concurrent first requests wait
+    for a single scan of the blacklist. The filter is rebuilt with twice the
+    capacity once it holds more tokens than it was sized for. Blacklist
+    writes of other processes are not seen until the next rebuild;
+    `FilteredRefreshToken.blacklist` catches reuses of those tokens.
+    """
+
+    def __init__(self):
+        self._filter = None
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+
+    def might_contain(self, jti):
+        return self._get_filter().might_contain(jti)
+
+    def add(self, jti):
+        bloom = self._get_filter()
+        with self._lock:
+            bloom.add(jti)
+            if bloom.count > bloom.capacity:
+                self._filter = None
+
+    def rebuild(self, capacity=None):
+        """
+        Load every blacklisted token id into a new filter, sized for
+        `capacity` tokens (by default the configured capacity, or twice the
+        blacklist size when larger).
+        """
+        with self._rebuild_lock:
+            return self._load(capacity)
+
+    def warm(self):
+        """
+        Load the filter ahead of the first request; called when a server
+        process boots. The load runs in its own thread, so it also works
+        from an event loop. When the database cannot be read yet, the filter
+        is loaded on first use instead.
+        """
+        def load():
+            try:
+                self._get_filter()
+            except DatabaseError:
+                logger.exception('Could not load the token blacklist filter.')
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=load, name='blacklist-filter-warmup')
+        thread.start()
+        thread.join()
+
+    def _load(self, capacity=None):
+        options = settings.TOKEN_BLACKLIST_FILTER
+        jtis = BlacklistedToken.objects.values_list('token__jti', flat=True)
+        if capacity is None:
+            capacity = max(options['CAPACITY'], jtis.count() * 2)
+        bloom = BloomFilter(capacity, options['ERROR_RATE'])
+        for jti in jtis.iterator(chunk_size=10000):
+            bloom.add(jti)
+        with self._lock:
+            self._filter = bloom
+        return bloom
+
+    def reset(self):
+        with self._lock:
+            self._filter = None
+
+    def _get_filter(self):
+        bloom = self._filter
+        if bloom is None:
+            with self._rebuild_lock:
+                # Another thread may have loaded it while this one waited.
+                bloom = self._filter
+                if bloom is None:
+                    bloom = self._load()
+        return bloom
+
+
+blacklist_filter = BlacklistFilter()
@@ -0,0 +1,36 @@
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.authentication.tokens.blacklist_filter import blacklist_filter
+
+
+class FilteredRefreshToken(RefreshToken):
+    """
+    Refresh token that asks the blacklist filter before querying the
+    blacklist tables, and keeps the filter up to date when blacklisted.
+    """
+
+    def check_blacklist(self):
+        if blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        """
+        Blacklist the token and return `(blacklisted_token, created)`.
+
+        `created` is False when the token was already blacklisted, which
+        the filter of this process may not have known.
+        """
+        blacklisted_token, created = super().blacklist()
+        blacklist_filter.add(self.payload[api_settings.JTI_CLAIM])
+        return blacklisted_token, created
+
+    def rotate(self):
+        """
+        Blacklist the token for good, failing if it was already used.
+        """
+        if not self.blacklist()[1]:
+            raise TokenError(_("Token is blacklisted"))
@@ -1,16 +1,15 @@
 from django.contrib.auth import logout
-from django.contrib.auth.hashers import check_password
 
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.permissions import AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
-
+from apps.authentication.backends.cached_jwt_authentication import CachedJWTAuthentication
+from apps.authentication.tokens.refresh_token import FilteredRefreshToken
+from apps.users.hashing.password_hasher import password_hasher
 from apps.users.models.user import User
 from apps.authentication.serializers.authentication_serializer import (
     AuthenticationSerializer,
@@ -20,7 +19,7 @@ from apps.authentication.serializers.authentication_serializer import (
 
 class AuthenticationViewSet(GenericViewSet):
 
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [AllowAny]
 
     def get_serializer_class(self):
@@ -39,6 +38,10 @@ class AuthenticationViewSet(GenericViewSet):
         If the provided email and password are correct,
         returns a new refresh and access token for the user.
         The refresh token can be used to generate new access tokens.
+
+        The password is checked by the password hashing pool; when too many
+        checks are already waiting, the login is answered 503 and can be
+        retried.
         ---
         Body:
             {
@@ -66,10 +69,10 @@ class AuthenticationViewSet(GenericViewSet):
             raise AuthenticationFailed(
                 "User with the provided email does not exist")
 
-        if not check_password(user_data['password'], user.password):
+        if not password_hasher.check_password(user_data['password'], user.password):
             raise AuthenticationFailed("Incorrect password")
 
-        refresh = RefreshToken.for_user(user)
+        refresh = FilteredRefreshToken.for_user(user)
 
         data = {
             "refresh": str(refresh),
@@ -104,8 +107,8 @@ class AuthenticationViewSet(GenericViewSet):
 
         if refresh_token:
             try:
-                RefreshToken(refresh_token).blacklist()
-            except RefreshToken.InvalidToken:
+                FilteredRefreshToken(refresh_token).blacklist()
+            except FilteredRefreshToken.InvalidToken:
                 logout(request)
                 return Response({"detail": "Refresh token is invalid"},
                                 status=status.HTTP_400_BAD_REQUEST)
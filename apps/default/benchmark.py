@@ -0,0 +1,109 @@
+"""
+Helpers shared by the benchmark management commands, which load a real
+server process over raw sockets.
+"""
+import asyncio
+import socket
+import statistics
+import subprocess
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.core.management.base import CommandError
+
+from apps.products.models.product import Product
+from apps.users.models.user import User
+
+
+@contextmanager
+def benchmark_catalog(rows, password=None):
+    """
+    Create a throwaway user owning `rows` products and yield the user;
+    both are deleted on exit.
+    """
+    user = User.objects.create_user(
+        email=f'benchmark-{uuid.uuid4().hex}@example.com',
+        password=password,
+        first_name='Benchmark',
+        last_name='User',
+    )
+    try:
+        Product.objects.bulk_create(
+            Product(user=user, name=f'Product {index}', description='Benchmark product',
+                    price=index % 1000, stock=index % 50)
+            for index in range(rows)
+        )
+        yield user
+    finally:
+        Product.objects.filter(user=user).delete()
+        user.delete()
+
+
+@contextmanager
+def running_server(command, env=None):
+    """
+    Start the server process built by `command(port)` on a free local port
+    and yield the port once it accepts connections. The process is stopped
+    on exit.
+    """
+    port = free_port()
+    process = subprocess.Popen(command(port), env=env, stdout=subprocess.DEVNULL)
+    try:
+        wait_until_ready(port)
+        yield port
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def request(port, method, path, body='', delay=0):
+    """
+    Send one HTTP/1.1 request to the local server and return the response
+    status code, or None when the connection or the response failed.
+    `delay` holds back the end of the headers, like a slow client.
+    """
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        return None
+    try:
+        payload = body.encode()
+        writer.write(f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n'.encode())
+        await writer.drain()
+        if delay:
+            await asyncio.sleep(delay)
+        writer.write(
+            f'Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n'
+            f'Connection: close\r\n\r\n'.encode() + payload
+        )
+        await writer.drain()
+        response = await reader.read()
+        return int(response.split(b' ', 2)[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    finally:
+        writer.close()
+
+
+def wait_until_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f'The server on port {port} did not start.')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, percent):
+    if not values:
+        return 0
+    return statistics.quantiles(values, n=100)[percent - 1] if len(values) > 1 else values[0]
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.default.models.idempotency_key import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the expired idempotency keys in batches, then the oldest keys '
+        'beyond the configured maximum. Meant to run every hour or so.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--max-keys', type=int, default=settings.IDEMPOTENCY['MAX_KEYS'])
+
+    def handle(self, *args, **options):
+        expired = self.purge(IdempotencyKey.objects.delete_expired, options['batch_size'])
+        oldest = self.purge(
+            lambda batch_size: IdempotencyKey.objects.delete_oldest(options['max_keys'], batch_size),
+            options['batch_size'])
+        self.stdout.write(f'Deleted {expired} expired and {oldest} excess idempotency keys')
+
+    def purge(self, delete_batch, batch_size):
+        total = 0
+        while True:
+            deleted = delete_batch(batch_size=batch_size)
+            if not deleted:
+                return total
+            total += deleted
@@ -0,0 +1 @@
+from apps.default.models.idempotency_key import IdempotencyKey
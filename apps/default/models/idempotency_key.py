@@ -0,0 +1,24 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+from apps.default.models.base_model import BaseModel
+from apps.default.models.idempotency_key_manager import IdempotencyKeyManager
+
+
+class IdempotencyKey(BaseModel):
+    """
+    The result of the first request sent with an `Idempotency-Key` header,
+    replayed to its retries until it is purged after `expires_at`.
+    """
+    # Digest of the key and the user, method and path it is scoped to.
+    key = models.CharField(max_length=64, unique=True)
+    # Digest of the request body, to tell retries from reused keys.
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = IdempotencyKeyManager()
+
+    def __str__(self):
+        return self.key
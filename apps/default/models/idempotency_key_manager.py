@@ -0,0 +1,102 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connections, models, transaction
+from django.utils import timezone
+
+
+class IdempotencyConflict(Exception):
+    """The first request of an idempotency key did not finish in time."""
+
+
+class IdempotencyMismatch(Exception):
+    """An idempotency key was reused with a different request body."""
+
+
+class IdempotencyKeyManager(models.Manager):
+    """Manager for the stored results of idempotent writes."""
+
+    def make_key(self, scope, key):
+        return hashlib.sha256(('%s|%s' % (scope, key)).encode()).hexdigest()
+
+    def run(self, scope, key, fingerprint, execute):
+        """
+        Return `(status_code, data, replayed)` for the request `key` of
+        `scope`, calling `execute` (which returns a status code and data)
+        only for the first request of the key.
+
+        The key row is inserted in the same transaction as the write, so the
+        result is stored exactly when the write commits. Its unique index
+        makes concurrent duplicates, from any process, wait for the first
+        request to commit and replay its result; when it rolls back
+        (exceptions and 5xx results) the next duplicate runs instead.
+
+        Raises IdempotencyMismatch when the key was used with another
+        `fingerprint` of the request body, and IdempotencyConflict when the
+        first request is still running after the configured wait.
+
+        Expired keys keep replaying until `purge_idempotency_keys` deletes
+        them, which keeps expiry off the request path.
+        """
+        options = settings.IDEMPOTENCY
+        key = self.make_key(scope, key)
+
+        with transaction.atomic(using=self.db):
+            if not self.claim(key, fingerprint, options['WAIT']):
+                stored = self.filter(key=key).only('fingerprint', 'status_code', 'response').first()
+                if stored is None:
+                    raise IdempotencyConflict()
+                if stored.fingerprint != fingerprint:
+                    raise IdempotencyMismatch()
+                return stored.status_code, stored.response, True
+
+            status_code, data = execute()
+            if status_code >= 500:
+                transaction.set_rollback(True, using=self.db)
+            else:
+                self.filter(key=key).update(status_code=status_code, response=data)
+        return status_code, data, False
+
+    def claim(self, key, fingerprint, wait):
+        """
+        Insert the row of `key`, waiting up to `wait` seconds for a
+        concurrent insert of the same key to commit or roll back. Returns
+        False when the key is already stored.
+        """
+        connection = connections[self.db]
+        try:
+            with transaction.atomic(using=self.db):
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT set_config('lock_timeout', %s, true)",
+                                       ['%dms' % (wait * 1000)])
+                self.create(key=key, fingerprint=fingerprint, status_code=0,
+                            expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY['TTL']))
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL lock_timeout TO DEFAULT')
+        except IntegrityError:
+            return False
+        except OperationalError:
+            raise IdempotencyConflict()
+        return True
+
+    def delete_expired(self, batch_size=5000):
+        """
+        Delete one batch of expired keys. Returns the number deleted.
+        """
+        ids = list(self.filter(expires_at__lte=timezone.now()).order_by('expires_at')
+                       .values_list('pk', flat=True)[:batch_size])
+        return self.filter(pk__in=ids).delete()[0]
+
+    def delete_oldest(self, max_keys, batch_size=5000):
+        """
+        Delete one batch of the oldest keys beyond the newest `max_keys`.
+        Returns the number deleted.
+        """
+        excess = self.count() - max_keys
+        if excess <= 0:
+            return 0
+        ids = list(self.order_by('expires_at').values_list('pk', flat=True)[:min(excess, batch_size)])
+        return self.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,203 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique, composite ordering.
+
+    Every page is fetched with a range condition on the ordering columns
+    instead of an OFFSET, so the cost of a page only depends on its size and
+    rows inserted while a client is paging never shift the following pages.
+    The cursor is an opaque token holding the ordering values of the row
+    the page starts after (or before, when paging backwards).
+    """
+    ordering = ('created_at', 'id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        config = getattr(settings, 'KEYSET_PAGINATION', {})
+        self.page_size = config.get('PAGE_SIZE', 50)
+        self.max_page_size = config.get('MAX_PAGE_SIZE', 200)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Same as `paginate_queryset`, fetching the page with the async ORM.
+        """
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.set_page([item async for item in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        Return the queryset of the requested page, plus one row telling
+        whether more rows follow.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        cursor = self.decode_cursor(request, queryset.model)
+        self.reverse, self.position = cursor if cursor else (False, None)
+
+        if self.reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if self.position is not None:
+            queryset = queryset.filter(
+                _keyset_condition(self.ordering, self.position, self.reverse))
+
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        page = results[:self.page_size]
+        has_following = len(results) > len(page)
+
+        if self.reverse:
+            page.reverse()
+            self.has_next = True
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = self.position is not None
+
+        self.page = page
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Return the ordering of the page.
+
+        Filter backends exposing `get_ordering` decide the ordering, as with
+        DRF's own cursor pagination; otherwise the class default is used.
+        The last ordering column must be unique for cursors to be stable.
+        """
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                return tuple(backend().get_ordering(request, queryset, view))
+        return self.ordering
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            values = payload['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = tuple(
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            )
+            reverse = bool(payload.get('r'))
+        except (FieldDoesNotExist, KeyError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return reverse, position
+
+    def encode_cursor(self, item, reverse):
+        payload = {'p': [_position_value(item, field) for field in self.ordering]}
+        if reverse:
+            payload['r'] = 1
+        encoded = urlsafe_b64encode(
+            json.dumps(payload, separators=(',', ':')).encode('ascii')
+        ).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+def _reverse_ordering(ordering):
+    return tuple(
+        field[1:] if field.startswith('-') else '-' + field
+        for field in ordering
+    )
+
+
+def _keyset_condition(ordering, position, reverse):
+    """
+    Build the row-value comparison `(a, b, ...) > (x, y, ...)` as a Q object.
+
+    Descending columns compare the other way round, and so does the whole
+    expression when paging backwards. A leading `a >= x` conjunct is added so
+    the database can start an index range scan at the cursor position.
+    """
+    lookups = []
+    for field in ordering:
+        descending = field.startswith('-') != reverse
+        lookups.append((field.lstrip('-'), 'lt' if descending else 'gt'))
+
+    condition = Q()
+    equal = Q()
+    for (name, lookup), value in zip(lookups, position):
+        condition |= equal & Q(**{'%s__%s' % (name, lookup): value})
+        equal &= Q(**{name: value})
+
+    first_name, first_lookup = lookups[0]
+    return Q(**{'%s__%se' % (first_name, first_lookup): position[0]}) & condition
+
+
+def _position_value(item, field):
+    name = field.lstrip('-')
+    value = item[name] if isinstance(item, dict) else getattr(item, name)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
@@ -0,0 +1,33 @@
+from django.http import HttpResponse
+from django.views import View
+
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+
+class AsyncAPIView(View):
+    """
+    Base class of read-only async views answering like the DRF views.
+
+    DRF views are synchronous, so under ASGI every request to them occupies
+    a worker thread for its whole duration. Subclasses implement `async def
+    get` with the async ORM instead, and Django awaits them on the event
+    loop. `self.request` is wrapped in a DRF `Request`, so filter backends,
+    paginators and serializers work unchanged, and DRF exceptions are
+    rendered like DRF would.
+    """
+    http_method_names = ['get', 'head', 'options']
+    renderer = JSONRenderer()
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.request = Request(request)
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return self.render(detail, status=exc.status_code)
+
+    def render(self, data, status=200):
+        return HttpResponse(self.renderer.render(data), status=status,
+                            content_type=self.renderer.media_type)
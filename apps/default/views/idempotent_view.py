@@ -0,0 +1,84 @@
+import hashlib
+import json
+
+from django.core.files.uploadedfile import UploadedFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import QueryDict
+
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from apps.default.models.idempotency_key import IdempotencyKey
+from apps.default.models.idempotency_key_manager import IdempotencyConflict, IdempotencyMismatch
+
+
+class IdempotentMixin:
+    """
+    Run writes sent with an `Idempotency-Key` header once per key.
+
+    Keys are scoped to the user, method and path, so two users (or two
+    endpoints) never share a result. Retries get the stored response back
+    with an `Idempotent-Replayed: true` header; reusing a key with another
+    request body is answered with a 422.
+    """
+    idempotency_header = 'Idempotency-Key'
+    max_idempotency_key_length = 255
+
+    def idempotent_response(self, request, handler):
+        """
+        Return the response of `handler` for a new key, or the stored
+        response of the first request for a known one. Requests without the
+        header always run `handler`.
+        """
+        key = request.headers.get(self.idempotency_header)
+        if key is None:
+            return handler()
+        if not key or len(key) > self.max_idempotency_key_length:
+            raise ValidationError({self.idempotency_header: [
+                f"Must have between 1 and {self.max_idempotency_key_length} characters."]})
+
+        def execute():
+            response = handler()
+            return response.status_code, response.data
+
+        scope = '%s|%s|%s' % (request.user.pk, request.method, request.path)
+        fingerprint = self.get_request_fingerprint(request)
+        try:
+            status_code, data, replayed = IdempotencyKey.objects.run(
+                scope, key, fingerprint, execute)
+        except IdempotencyConflict:
+            return Response({"detail": "A request with this Idempotency-Key is still running."},
+                status=status.HTTP_409_CONFLICT
+            )
+        except IdempotencyMismatch:
+            return Response({"detail": "This Idempotency-Key was used with another request body."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+
+        response = Response(data, status=status_code)
+        if replayed:
+            response['Idempotent-Replayed'] = 'true'
+        return response
+
+    def get_request_fingerprint(self, request):
+        """
+        Hash the parsed request body, uploaded files included.
+        """
+        digest = hashlib.sha256()
+        data = request.data
+        if not isinstance(data, QueryDict):
+            digest.update(json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder).encode())
+            return digest.hexdigest()
+
+        for name in sorted(data):
+            for value in data.getlist(name):
+                digest.update(b'%s\0' % name.encode())
+                if isinstance(value, UploadedFile):
+                    for chunk in value.chunks():
+                        digest.update(chunk)
+                    value.seek(0)
+                else:
+                    digest.update(str(value).encode())
+                digest.update(b'\0')
+        return digest.hexdigest()
@@ -0,0 +1,56 @@
+from rest_framework.exceptions import ValidationError
+
+
+class SparseFieldsetMixin:
+    """
+    Let clients pick the fields of read responses with `?fields=a,b,c`.
+
+    The selection restricts both the serializer output and the columns
+    loaded from the database, so payload size and database I/O shrink with
+    what the client asks for.
+    """
+    fields_query_param = 'fields'
+    sparse_fieldset_actions = ('list', 'retrieve')
+    # Model fields loaded for serializer fields that are not model fields,
+    # or that need more than their own column.
+    sparse_field_columns = {}
+
+    def get_requested_fields(self):
+        """
+        Return the requested field names in serializer order, or None when
+        the client did not restrict the fields.
+        """
+        if self.action not in self.sparse_fieldset_actions:
+            return None
+
+        value = self.request.query_params.get(self.fields_query_param)
+        if not value:
+            return None
+
+        requested = {name.strip() for name in value.split(',') if name.strip()}
+        available = self.get_serializer_class().Meta.fields
+        unknown = requested.difference(available)
+        if unknown:
+            raise ValidationError({
+                self.fields_query_param: ["Unknown fields: %s." % ', '.join(sorted(unknown))]
+            })
+        return [name for name in available if name in requested]
+
+    def get_sparse_queryset(self, queryset, required=()):
+        """
+        Defer the columns the requested fields do not need. `required` lists
+        model fields that must be loaded anyway, such as ordering columns.
+        """
+        fields = self.get_requested_fields()
+        if fields is None:
+            return queryset
+        columns = []
+        for field in fields:
+            columns.extend(self.sparse_field_columns.get(field, [field]))
+        return queryset.only(*columns, *required)
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,94 @@
+import hashlib
+import threading
+import time
+
+from django.core.cache import caches
+
+
+class ProductCache:
+    """
+    Read-through cache of serialized product payloads.
+
+    Payloads are stored under versioned keys: the list pages share one
+    version and every product has its own, so a write only has to bump the
+    versions it affects and all the stale entries become unreachable, however
+    many query string variants were cached for them. Versions start from a
+    clock value rather than 1, so a version key evicted by the cache can
+    never come back and match entries written before the eviction.
+    """
+    list_namespace = 'list'
+
+    def __init__(self, alias='products'):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_or_set(self, namespace, request, loader):
+        """
+        Return the payload cached for `request`, calling `loader` to build
+        and store it on a miss.
+        """
+        key = self.make_key(namespace, request)
+        data = self.cache.get(key)
+        if data is not None:
+            self._count(hit=True)
+            return data
+
+        self._count(hit=False)
+        data = loader()
+        self.cache.set(key, data)
+        return data
+
+    def make_key(self, namespace, request):
+        uri = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        return 'products:%s:%s:%s' % (namespace, self._get_version(namespace), uri)
+
+    def invalidate(self, pk=None):
+        """
+        Drop the cached list pages and, when `pk` is given, the cached
+        payloads of that product. With a per-process backend this only
+        reaches the cache of the calling process, so it is pointless
+        outside the server processes.
+        """
+        self._bump_version(self.list_namespace)
+        if pk is not None:
+            self._bump_version(str(pk))
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _get_version(self, namespace):
+        key = 'products:version:%s' % namespace
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, time.time_ns(), timeout=None)
+            version = self.cache.get(key)
+        return version
+
+    def _bump_version(self, namespace):
+        try:
+            self.cache.incr('products:version:%s' % namespace)
+        except ValueError:
+            # Nothing can be cached under a version that does not exist yet.
+            pass
+
+
+product_cache = ProductCache()
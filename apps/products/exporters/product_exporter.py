@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.conf import settings
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.products.serializers.product_serializer import ProductValuesSerializer
+
+
+class ProductExporter:
+    """
+    Render a product queryset as NDJSON or CSV, one chunk at a time.
+
+    Rows are read through a server-side cursor with
+    `iterator(chunk_size=...)` and rendered by `ProductValuesSerializer`
+    chunk by chunk, so memory use depends on the chunk size and not on the
+    size of the catalog. The generators are meant for `StreamingHttpResponse`.
+    """
+    formats = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv',
+    }
+    # CSV has no room for the nested derivative URLs.
+    csv_fields = ['id', 'user', 'name', 'description', 'price', 'stock', 'image']
+
+    def __init__(self, queryset, context=None, chunk_size=None):
+        self.queryset = queryset
+        self.context = context
+        self.chunk_size = chunk_size or settings.PRODUCT_EXPORT['CHUNK_SIZE']
+
+    def render(self, file_format):
+        if file_format == 'csv':
+            return self.csv()
+        return self.ndjson()
+
+    def ndjson(self):
+        encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        for data in self.chunks():
+            yield ''.join(encoder.encode(item) + '\n' for item in data).encode()
+
+    def csv(self):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=self.csv_fields)
+        writer.writeheader()
+        for data in self.chunks(self.csv_fields):
+            writer.writerows(data)
+            yield self.drain(buffer)
+        # Only the header is left when there are no products.
+        content = self.drain(buffer)
+        if content:
+            yield content
+
+    def chunks(self, fields=None):
+        """
+        Yield the serialized products, a list of `chunk_size` at a time.
+        """
+        rows = ProductValuesSerializer.values(self.queryset, fields).iterator(
+            chunk_size=self.chunk_size)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            yield ProductValuesSerializer(chunk, context=self.context, fields=fields).data
+
+    def drain(self, buffer):
+        content = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return content
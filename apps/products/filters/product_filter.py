@@ -0,0 +1,51 @@
+from rest_framework.filters import BaseFilterBackend
+
+from apps.products.serializers.product_filter_serializer import ProductFilterSerializer
+
+
+class ProductFilterBackend(BaseFilterBackend):
+    """
+    Filter products on price and stock ranges and order them by a
+    whitelisted key.
+
+    Every ordering ends with the primary key, so it is unique and usable by
+    the keyset pagination, and every filter/ordering pair has a matching
+    index (see the Product model), so filtered pages stay index range scans.
+    """
+    orderings = {
+        'created_at': ('created_at', 'id'),
+        '-created_at': ('-created_at', '-id'),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+        'stock': ('stock', 'id'),
+        '-stock': ('-stock', '-id'),
+    }
+    default_ordering = 'created_at'
+
+    def get_params(self, request):
+        serializer = ProductFilterSerializer(data=request.query_params.dict())
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def filter_queryset(self, request, queryset, view):
+        params = self.get_params(request)
+        lookups = {
+            'min_price': 'price__gte',
+            'max_price': 'price__lte',
+            'min_stock': 'stock__gte',
+            'max_stock': 'stock__lte',
+        }
+        queryset = queryset.filter(**{
+            lookup: params[param] for param, lookup in lookups.items() if param in params
+        })
+
+        if 'in_stock' in params:
+            if params['in_stock']:
+                queryset = queryset.filter(stock__gt=0)
+            else:
+                queryset = queryset.filter(stock__lte=0)
+        return queryset
+
+    def get_ordering(self, request, queryset, view):
+        params = self.get_params(request)
+        return self.orderings[params.get('ordering', self.default_ordering)]
@@ -0,0 +1,52 @@
+import io
+
+from PIL import Image, ImageOps
+
+
+# Pillow format names and save options of the supported derivative formats.
+FORMATS = {
+    'webp': ('WEBP', {'method': 4}),
+    'jpeg': ('JPEG', {'optimize': True, 'progressive': True}),
+}
+
+
+def render_derivatives(source, sizes, formats, quality):
+    """
+    Render the derivatives of an image.
+
+    `source` holds the bytes of the original image and `sizes` maps a size
+    name to the longest side, in pixels, of its derivative. Images are only
+    ever scaled down. Returns the encoded bytes of every derivative, keyed
+    by `(size, format)`.
+
+    This runs in a worker process: it only depends on Pillow, so the worker
+    never has to set up Django.
+    """
+    with Image.open(io.BytesIO(source)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        derivatives = {}
+        for size, longest_side in sizes.items():
+            resized = image.copy()
+            resized.thumbnail((longest_side, longest_side), Image.LANCZOS)
+            for name in formats:
+                pillow_format, options = FORMATS[name]
+                output = resized
+                if pillow_format == 'JPEG' and output.mode != 'RGB':
+                    output = _flatten(output)
+                buffer = io.BytesIO()
+                output.save(buffer, pillow_format, quality=quality, **options)
+                derivatives[size, name] = buffer.getvalue()
+        return derivatives
+
+
+def _flatten(image):
+    """
+    Paint an image with transparency over a white background, as JPEG has
+    no alpha channel.
+    """
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
@@ -0,0 +1,194 @@
+import atexit
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import posixpath
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils import timezone
+
+from apps.products.cache.product_cache import product_cache
+from apps.products.images.derivatives import render_derivatives
+
+logger = logging.getLogger(__name__)
+
+
+class ImageDerivativePipeline:
+    """
+    Generate the resized copies of product images off the request path.
+
+    Pillow runs in a pool of worker processes, so resizing never holds the
+    GIL of the processes serving requests. A small pool of threads feeds
+    them: each thread reads the original from storage, waits for the
+    worker, stores the derivatives and records them on the product. A
+    result is only recorded while the product still has the image it was
+    rendered from, so a newer upload is never overwritten by older work.
+    The derivatives of replaced images and deleted products are removed by
+    `collect`.
+    """
+    extensions = {'webp': 'webp', 'jpeg': 'jpg'}
+    # Derivatives belong to one product and are not deduplicated like the
+    # originals, so they go to the default storage under the same MEDIA_ROOT.
+    storage = default_storage
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._processes = None
+        self._threads = None
+        self._pending = set()
+
+    @property
+    def config(self):
+        return settings.PRODUCT_IMAGE_DERIVATIVES
+
+    @property
+    def products(self):
+        # Looked up lazily: the Product model schedules work on this pipeline.
+        return apps.get_model('products', 'Product')
+
+    def enqueue(self, product):
+        """
+        Schedule the derivatives of the current image of `product`. Returns
+        a future resolving to the recorded derivatives, or None when the
+        product has no image.
+        """
+        if not product.image:
+            return None
+        return self._submit(self.generate, product.pk, product.image.name)
+
+    def collect(self, pk):
+        """
+        Schedule the removal of the derivatives of product `pk` that were not
+        rendered from its current image. Returns a future.
+        """
+        return self._submit(self.delete_stale, pk)
+
+    def wait(self, timeout=None):
+        """
+        Block until every scheduled image has been processed.
+        """
+        with self._lock:
+            pending = list(self._pending)
+        concurrent.futures.wait(pending, timeout=timeout)
+
+    def shutdown(self):
+        """
+        Finish the scheduled work and stop the worker threads and processes.
+        """
+        with self._lock:
+            threads, self._threads = self._threads, None
+        if threads is not None:
+            threads.shutdown(wait=True)
+        with self._lock:
+            processes, self._processes = self._processes, None
+        if processes is not None:
+            processes.shutdown(wait=True)
+
+    def generate(self, pk, name):
+        try:
+            with self.products._meta.get_field('image').storage.open(name, 'rb') as image:
+                source = image.read()
+
+            rendered = self._get_processes().submit(
+                render_derivatives, source, self.config['SIZES'],
+                self.config['FORMATS'], self.config['QUALITY'],
+            ).result()
+
+            stem = posixpath.splitext(posixpath.basename(name))[0]
+            derivatives = {}
+            for (size, image_format), content in rendered.items():
+                path = posixpath.join(
+                    self.config['DIRECTORY'], str(pk),
+                    '%s-%s.%s' % (stem, size, self.extensions[image_format]))
+                derivatives.setdefault(size, {})[image_format] = self.storage.save(
+                    path, ContentFile(content))
+
+            updated = self.products.objects.filter(pk=pk, image=name).update(
+                image_derivatives=derivatives, updated_at=timezone.now())
+            if not updated:
+                # The image changed or the product is gone meanwhile.
+                for formats in derivatives.values():
+                    for path in formats.values():
+                        self.storage.delete(path)
+                return None
+
+            product_cache.invalidate(pk)
+            return derivatives
+        except Exception:
+            logger.exception('Could not generate the derivatives of %s.', name)
+            raise
+        finally:
+            connection.close()
+
+    def delete_stale(self, pk):
+        """
+        Delete the derivatives of product `pk` that do not belong to its
+        current image, or all of them when the product is gone.
+        """
+        directory = posixpath.join(self.config['DIRECTORY'], str(pk))
+        try:
+            names = self.storage.listdir(directory)[1]
+        except FileNotFoundError:
+            return 0
+
+        try:
+            # Read after listing: the derivatives of a newer image are only
+            # written once it is committed, so they show up here as current.
+            image = self.products.objects.filter(pk=pk).values_list('image', flat=True).first()
+            stem = posixpath.splitext(posixpath.basename(image))[0] if image is not None else None
+            stale = [name for name in names if name.rsplit('-', 1)[0] != stem]
+            for name in stale:
+                self.storage.delete(posixpath.join(directory, name))
+
+            if image is None and len(stale) == len(names):
+                try:
+                    os.rmdir(self.storage.path(directory))
+                except (NotImplementedError, OSError):
+                    pass
+            return len(stale)
+        except Exception:
+            logger.exception('Could not delete the stale derivatives of product %s.', pk)
+            raise
+        finally:
+            connection.close()
+
+    def _submit(self, fn, *args):
+        future = self._get_threads().submit(fn, *args)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def _get_threads(self):
+        with self._lock:
+            if self._threads is None:
+                self._threads = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.config['WORKERS'],
+                    thread_name_prefix='image-derivatives',
+                )
+            return self._threads
+
+    def _get_processes(self):
+        with self._lock:
+            if self._processes is None:
+                # Spawned workers start clean instead of inheriting the
+                # threads, locks and database connections of a fork.
+                self._processes = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.config['WORKERS'],
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+                atexit.register(self.shutdown)
+            return self._processes
+
+    def _discard(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+
+image_pipeline = ImageDerivativePipeline()
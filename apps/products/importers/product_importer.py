@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.db import transaction
+
+from rest_framework.exceptions import ValidationError
+
+from apps.products.models.product import Product
+from apps.products.serializers.product_serializer import ProductSerializer
+
+
+class ProductImporter:
+    """
+    Import products from a CSV or JSON Lines file.
+
+    The file is read as a stream, one row at a time. Every row is validated
+    like a `create_product` request; valid rows are inserted with
+    `bulk_create`, `batch_size` at a time, and invalid rows are reported
+    with their errors. The whole import runs in one transaction, so an
+    interrupted import leaves no partial catalog behind.
+
+    Rows are numbered from 1, not counting the CSV header. Only the first
+    `max_errors` errors are kept in the report; `failed` counts them all.
+    """
+    formats = ('csv', 'jsonl')
+    fields = ['name', 'description', 'price', 'stock']
+
+    def __init__(self, user, batch_size=None, max_errors=None):
+        config = settings.PRODUCT_IMPORT
+        self.user = user
+        self.batch_size = batch_size or config['BATCH_SIZE']
+        self.max_errors = max_errors or config['MAX_ERRORS']
+
+    @classmethod
+    def get_format(cls, name):
+        """
+        Guess the format of a file from its name, or return None.
+        """
+        extension = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+        if extension == 'csv':
+            return 'csv'
+        if extension in ('jsonl', 'ndjson'):
+            return 'jsonl'
+        return None
+
+    def run(self, file, file_format):
+        """
+        Import the rows of the binary `file`. Returns the report:
+        `{"created": int, "failed": int, "errors": [{"row": int, "errors": {...}}]}`.
+        """
+        report = {'created': 0, 'failed': 0, 'errors': []}
+        batch = []
+        with transaction.atomic():
+            try:
+                for number, row in enumerate(self.read(file, file_format), start=1):
+                    serializer = ProductSerializer(data=row, fields=self.fields)
+                    if serializer.is_valid():
+                        batch.append(Product(user=self.user, **serializer.validated_data))
+                    else:
+                        self.add_error(report, number, serializer.errors)
+
+                    if len(batch) >= self.batch_size:
+                        report['created'] += self.write(batch)
+                        batch = []
+            except (UnicodeDecodeError, csv.Error) as error:
+                raise ValidationError({"file": ["Could not read the file: %s" % error]})
+            report['created'] += self.write(batch)
+        return report
+
+    def read(self, file, file_format):
+        """
+        Yield the rows of `file` as dictionaries. Lines that are not valid
+        JSON objects are yielded as None and fail validation.
+        """
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        try:
+            if file_format == 'csv':
+                yield from csv.DictReader(text)
+            else:
+                for line in text:
+                    if not line.strip():
+                        continue
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        row = None
+                    yield row if isinstance(row, dict) else None
+        finally:
+            # Leave the underlying file open for its owner.
+            text.detach()
+
+    def write(self, batch):
+        if batch:
+            Product.objects.bulk_create(batch)
+        return len(batch)
+
+    def add_error(self, report, number, errors):
+        report['failed'] += 1
+        if len(report['errors']) < self.max_errors:
+            report['errors'].append({'row': number, 'errors': errors})
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.products.models.purchase import Purchase
+
+
+class Command(BaseCommand):
+    help = (
+        'Apply the queued purchases to the product stock in batches, '
+        'rejecting those the stock cannot serve. Drains the queue and exits, '
+        'or keeps polling it with --interval.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Seconds to wait for new purchases once the queue is empty.')
+
+    def handle(self, *args, **options):
+        while True:
+            applied, rejected = self.drain(options['batch_size'])
+            if applied or rejected or options['interval'] is None:
+                self.stdout.write(f'Applied {applied} purchases, rejected {rejected}')
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        total_applied = total_rejected = 0
+        while True:
+            applied, rejected, _ = Purchase.objects.apply_pending(batch_size=batch_size)
+            if not applied and not rejected:
+                return total_applied, total_rejected
+            total_applied += applied
+            total_rejected += rejected
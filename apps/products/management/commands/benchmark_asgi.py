@@ -0,0 +1,93 @@
+import asyncio
+import shutil
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.default.benchmark import benchmark_catalog, percentile, request, running_server
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the throughput of the product list under WSGI (gunicorn, '
+        'DRF view) and ASGI (uvicorn, DRF view and async view) with many '
+        'concurrent clients. Needs gunicorn and uvicorn installed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000)
+        # Django opens one database connection per in-flight ASGI request, so
+        # keep this below the max_connections of the database server.
+        parser.add_argument('--concurrency', type=int, default=80)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Server processes of every server.')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Threads of every gunicorn worker.')
+        parser.add_argument('--delay', type=float, default=0.2,
+                            help='Seconds slow clients take to send their request headers.')
+
+    def handle(self, *args, **options):
+        for executable in ('gunicorn', 'uvicorn'):
+            if shutil.which(executable) is None:
+                raise CommandError(f'{executable} is not installed.')
+
+        with benchmark_catalog(options['rows']):
+            runs = [
+                ('WSGI', 'DRF', self.wsgi_server, '/product/'),
+                ('ASGI', 'DRF', self.asgi_server, '/product/'),
+                ('ASGI', 'async', self.asgi_server, '/async/product/'),
+            ]
+            for server, view, command, path in runs:
+                with running_server(lambda port: command(port, options)) as port:
+                    latencies, errors, elapsed = asyncio.run(self.load(port, path, options))
+
+                self.stdout.write(
+                    f'{server} {view:>5}: {len(latencies) / elapsed:.0f} req/s, '
+                    f'p50 {percentile(latencies, 50) * 1000:.0f}ms, '
+                    f'p99 {percentile(latencies, 99) * 1000:.0f}ms, {errors} errors'
+                )
+
+    def wsgi_server(self, port, options):
+        return [
+            sys.executable, '-m', 'gunicorn', 'technical_challenge.wsgi:application',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers']),
+            '--worker-class', 'gthread', '--threads', str(options['threads']),
+            '--backlog', str(options['concurrency'] * 2), '--log-level', 'warning',
+        ]
+
+    def asgi_server(self, port, options):
+        return [
+            sys.executable, '-m', 'uvicorn', 'technical_challenge.asgi:application',
+            '--host', '127.0.0.1', '--port', str(port), '--workers', str(options['workers']),
+            '--backlog', str(options['concurrency'] * 2), '--log-level', 'warning',
+            '--no-access-log',
+        ]
+
+    async def load(self, port, path, options):
+        """
+        Run `concurrency` clients requesting `path` in a loop for `duration`
+        seconds. A unique query string per request keeps the product cache
+        out of the measure.
+        """
+        latencies = []
+        errors = 0
+        deadline = time.perf_counter() + options['duration']
+
+        async def client(index):
+            nonlocal errors
+            count = 0
+            while time.perf_counter() < deadline:
+                count += 1
+                started = time.perf_counter()
+                status = await request(port, 'GET', f'{path}?page_size=50&n={index}-{count}',
+                                       delay=options['delay'])
+                if status == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(index) for index in range(options['concurrency'])))
+        return latencies, errors, time.perf_counter() - started
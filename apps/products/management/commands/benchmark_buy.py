@@ -0,0 +1,110 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.products.models.product import Product
+from apps.products.models.purchase import Purchase
+from apps.users.models.user import User
+
+
+def legacy_buy(pk, user):
+    """The read-check-save purchase that `ProductViewSet.buy` used to run."""
+    product = Product.objects.filter(is_active=True).get(pk=pk)
+    if product.stock > 0:
+        product.stock -= 1
+        product.save()
+        return True
+    return False
+
+
+def atomic_buy(pk, user):
+    return Product.objects.decrement_stock(pk) is not None
+
+
+def queued_buy(pk, user):
+    return Purchase.objects.enqueue(pk, user) is not None
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the throughput and correctness of the legacy read-check-save '
+        'purchase with the single-statement stock decrement, on a plain and '
+        'on a sharded product, and with the purchase queue, by firing '
+        'concurrent purchases at one product of the configured database.'
+    )
+
+    paths = {
+        'legacy': legacy_buy,
+        'atomic': atomic_buy,
+        'sharded': atomic_buy,
+        'queued': queued_buy,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--purchases', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument(
+            '--stock', type=int, default=None,
+            help='Initial stock of the product; defaults to the number of purchases.'
+        )
+        parser.add_argument('--shards', type=int, default=8,
+                            help='Stock shards of the product of the sharded run.')
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(
+            email=f'benchmark-{uuid.uuid4().hex}@example.com',
+            first_name='Benchmark',
+            last_name='User',
+        )
+        try:
+            for name, buy in self.paths.items():
+                self.run_path(name, buy, user, options)
+        finally:
+            user.delete()
+
+    def run_path(self, name, buy, user, options):
+        purchases, workers = options['purchases'], options['workers']
+        stock = options['stock'] if options['stock'] is not None else purchases
+        product = Product.objects.create(
+            user=user, name='Benchmark product', description='', price=1, stock=stock)
+        if name == 'sharded':
+            Product.objects.shard_stock(product.pk, options['shards'])
+        if name == 'queued':
+            Product.objects.filter(pk=product.pk).update(queue_purchases=True)
+
+        def worker(count):
+            try:
+                return sum(buy(product.pk, user) for _ in range(count))
+            finally:
+                connection.close()
+
+        shares = [purchases // workers + (i < purchases % workers) for i in range(workers)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            sold = sum(executor.map(worker, shares))
+        elapsed = time.perf_counter() - started
+
+        if name == 'queued':
+            sold = self.apply_purchases()
+        Product.objects.refresh_sharded_stock()
+        product.refresh_from_db()
+        taken = stock - product.stock
+        self.stdout.write(
+            f'{name:>7}: {purchases} purchases in {elapsed:.2f}s '
+            f'({purchases / elapsed:.0f}/s), {sold} sold, '
+            f'{taken} units taken, {sold - taken} oversold'
+        )
+
+    def apply_purchases(self):
+        started = time.perf_counter()
+        total = 0
+        while True:
+            applied, rejected, _ = Purchase.objects.apply_pending()
+            if not applied and not rejected:
+                break
+            total += applied
+        self.stdout.write(f'{"":>7}  queue applied in {time.perf_counter() - started:.2f}s')
+        return total
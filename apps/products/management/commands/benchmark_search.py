@@ -0,0 +1,83 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.products.models.product import Product
+from apps.users.models.user import User
+
+WORDS = [
+    'wireless', 'keyboard', 'mouse', 'monitor', 'cable', 'laptop', 'stand', 'usb',
+    'charger', 'speaker', 'headphones', 'camera', 'lamp', 'desk', 'chair', 'backpack',
+    'phone', 'case', 'adapter', 'battery', 'bluetooth', 'microphone', 'router', 'tablet',
+    'printer', 'scanner', 'webcam', 'dock', 'hub', 'projector', 'drive', 'memory',
+    'ergonomic', 'portable', 'compact', 'premium', 'gaming', 'office', 'travel', 'smart',
+]
+
+QUERIES = ['keyboard', 'wireless keyboard', 'ergonomic office chair', '"usb hub"', 'xylophone']
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large catalog in the configured PostgreSQL database and '
+        'compare the latency of the indexed full-text product search with a '
+        'substring (icontains) search.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2_000_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The full-text search benchmark needs PostgreSQL.')
+
+        user = User.objects.create_user(
+            email=f'benchmark-{uuid.uuid4().hex}@example.com',
+            first_name='Benchmark',
+            last_name='User',
+        )
+        try:
+            started = time.perf_counter()
+            self.seed(user, options['rows'])
+            self.stdout.write(
+                f'Seeded {options["rows"]} products in {time.perf_counter() - started:.1f}s')
+
+            for text in QUERIES:
+                matches = Product.objects.full_text_search(text).filter(user=user).count()
+                full_text = self.measure(options, lambda: Product.objects.full_text_search(text))
+                substring = self.measure(options, lambda: Product.objects.substring_search(text))
+                self.stdout.write(
+                    f'{text!r:>26}: {matches} matches, full-text {full_text * 1000:.1f}ms, '
+                    f'substring {substring * 1000:.1f}ms'
+                )
+        finally:
+            Product.objects.filter(user=user).delete()
+            user.delete()
+
+    def seed(self, user, rows):
+        with connection.cursor() as cursor:
+            cursor.execute(f'''
+                INSERT INTO {Product._meta.db_table}
+                    (id, created_at, updated_at, is_active, is_staff, name,
+                     description, price, stock, image, image_derivatives, user_id)
+                SELECT gen_random_uuid(), now(), now(), true, false,
+                       w[1 + (random() * k)::int %% k] || ' ' || w[1 + (random() * k)::int %% k],
+                       w[1 + (random() * k)::int %% k] || ' ' || w[1 + (random() * k)::int %% k]
+                           || ' ' || w[1 + (random() * k)::int %% k] || ' item ' || n,
+                       n %% 1000, n %% 50, '', '{{}}', %s
+                FROM generate_series(1, %s) AS n,
+                     (SELECT %s::text[] AS w, %s AS k) AS words
+            ''', [user.pk, rows, WORDS, len(WORDS)])
+            cursor.execute(f'ANALYZE {Product._meta.db_table}')
+
+    def measure(self, options, search):
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            list(search()[:options['limit']])
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
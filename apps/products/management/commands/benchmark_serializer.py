@@ -0,0 +1,70 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from apps.products.models.product import Product
+from apps.products.serializers.product_serializer import (
+    ProductSerializer,
+    ProductValuesSerializer,
+)
+from apps.users.models.user import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the per-row cost of serializing product lists with '
+        'ProductSerializer and with the ProductValuesSerializer fast path, '
+        'fetch included, on tables of the given sizes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(
+            email=f'benchmark-{uuid.uuid4().hex}@example.com',
+            first_name='Benchmark',
+            last_name='User',
+        )
+        request = RequestFactory().get('/product/')
+        context = {'request': request}
+        try:
+            seeded = 0
+            for rows in sorted(options['rows']):
+                self.seed(user, rows - seeded)
+                seeded = rows
+                queryset = Product.objects.filter(user=user, is_active=True)
+
+                serializer = self.measure(options['repeat'], lambda: ProductSerializer(
+                    queryset.all(), many=True, context=context).data)
+                fast = self.measure(options['repeat'], lambda: ProductValuesSerializer(
+                    ProductValuesSerializer.values(queryset.all()), context=context).data)
+
+                self.stdout.write(
+                    f'{rows} rows: ProductSerializer {serializer / rows * 1e6:.1f}us/row, '
+                    f'ProductValuesSerializer {fast / rows * 1e6:.1f}us/row '
+                    f'({serializer / fast:.1f}x)'
+                )
+        finally:
+            Product.objects.filter(user=user).delete()
+            user.delete()
+
+    def seed(self, user, count):
+        batch = [
+            Product(user=user, name=f'Product {index}', description='Benchmark product ' * 10,
+                    price=index % 1000, stock=index % 50, image=f'product_image/{index}.jpg')
+            for index in range(count)
+        ]
+        Product.objects.bulk_create(batch, batch_size=5000)
+
+    def measure(self, repeat, serialize):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            serialize()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
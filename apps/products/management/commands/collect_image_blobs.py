@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.products.models.image_blob import ImageBlob
+from apps.products.models.product import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the stored product image blobs that no product references '
+        'anymore, in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Keep unreferenced blobs touched more recently than this.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--recount', action='store_true',
+                            help='Recompute the reference counts from the products first.')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            repaired = ImageBlob.objects.recount()
+            self.stdout.write(f'Repaired {repaired} reference counts')
+
+        storage = Product._meta.get_field('image').storage
+        before = timezone.now() - timedelta(hours=options['grace_hours'])
+        total_blobs = total_bytes = 0
+        while True:
+            examined, blobs, size = ImageBlob.objects.delete_unreferenced(
+                storage, before, batch_size=options['batch_size'])
+            if not examined:
+                break
+            total_blobs += blobs
+            total_bytes += size
+            self.stdout.write(f'Deleted {blobs} of {examined} blobs ({size} bytes)')
+
+        self.stdout.write(f'Deleted {total_blobs} unreferenced blobs, {total_bytes} bytes freed')
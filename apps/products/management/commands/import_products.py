@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.exceptions import ValidationError
+
+from apps.products.importers.product_importer import ProductImporter
+from apps.users.models.user import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Import products for a user from a CSV or JSON Lines file, in '
+        'batches and in a single transaction. Invalid rows are skipped and '
+        'reported.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help='Email of the owner of the products.')
+        parser.add_argument('--format', choices=ProductImporter.formats,
+                            help='Guessed from the file name if omitted.')
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'No user with email {options["user"]}.')
+
+        file_format = options['format'] or ProductImporter.get_format(options['path'])
+        if file_format is None:
+            raise CommandError('Cannot guess the file format, use --format.')
+
+        importer = ProductImporter(user, batch_size=options['batch_size'])
+        try:
+            with open(options['path'], 'rb') as file:
+                report = importer.run(file, file_format)
+        except (OSError, ValidationError) as error:
+            raise CommandError(str(error))
+
+        for error in report['errors']:
+            self.stderr.write(f'Row {error["row"]}: {error["errors"]}')
+        self.stdout.write(f'Created {report["created"]} products, {report["failed"]} rows failed')
@@ -0,0 +1,29 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.products.models.product import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Make purchases of a product go through the purchase queue, trading '
+        'immediate stock accuracy for write throughput, or back to direct '
+        'purchases with --disable.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_id')
+        parser.add_argument('--disable', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            product = Product.objects.get(pk=options['product_id'])
+        except (Product.DoesNotExist, ValidationError):
+            raise CommandError(f'Product {options["product_id"]} not found.')
+        if product.stock_shard_count and not options['disable']:
+            raise CommandError('Sharded products cannot queue purchases.')
+
+        product.queue_purchases = not options['disable']
+        product.save(update_fields=['queue_purchases', 'updated_at'])
+        state = 'queued' if product.queue_purchases else 'direct'
+        self.stdout.write(f'{product.name}: {state} purchases')
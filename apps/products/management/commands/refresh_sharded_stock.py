@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.models.product import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Refresh the stock shown for sharded products from their shard '
+        'totals. Meant to run every minute or so.'
+    )
+
+    def handle(self, *args, **options):
+        refreshed = Product.objects.refresh_sharded_stock()
+        self.stdout.write(f'Refreshed the stock of {refreshed} sharded products')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.products.models.reservation import Reservation
+
+
+class Command(BaseCommand):
+    help = (
+        'Expire the lapsed stock reservations and return their units to '
+        'stock, in batches. Meant to run every minute or so.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        products = set()
+        while True:
+            released = Reservation.objects.release_expired(batch_size=options['batch_size'])
+            if not released:
+                break
+            products.update(released)
+
+        self.stdout.write(f'Returned reserved stock to {len(products)} products')
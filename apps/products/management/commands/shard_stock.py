@@ -0,0 +1,27 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.products.models.product import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Split the stock of a hot product across several counter rows so '
+        'concurrent purchases stop queueing on one row lock, or gather it '
+        'back with --shards 0.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_id')
+        parser.add_argument('--shards', type=int, required=True)
+
+    def handle(self, *args, **options):
+        if not 0 <= options['shards'] <= 256:
+            raise CommandError('--shards must be between 0 and 256.')
+        try:
+            product = Product.objects.shard_stock(options['product_id'], options['shards'])
+        except (Product.DoesNotExist, ValidationError):
+            raise CommandError(f'Product {options["product_id"]} not found.')
+
+        self.stdout.write(
+            f'{product.name}: {product.stock} units across {product.stock_shard_count} shards')
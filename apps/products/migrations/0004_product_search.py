@@ -0,0 +1,86 @@
+# Generated by Django 5.0.4 on 2026-10-17 10:44
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# The search vector is maintained by a trigger, so it stays current for every
+# write path, including bulk_create, queryset updates and raw SQL. On updates
+# it fires whenever name or description are in the SET list, which includes
+# every full `Product.save()`; 0011 narrows it to actual text changes.
+CREATE_SEARCH_TRIGGER = """
+CREATE FUNCTION products_product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description ON products_product
+    FOR EACH ROW EXECUTE FUNCTION products_product_search_vector_update();
+
+UPDATE products_product SET
+    search_vector =
+        setweight(to_tsvector('pg_catalog.english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('pg_catalog.english', coalesce(description, '')), 'B');
+"""
+
+DROP_SEARCH_TRIGGER = """
+DROP TRIGGER products_product_search_vector_trigger ON products_product;
+DROP FUNCTION products_product_search_vector_update();
+"""
+
+CREATE_SEARCH_INDEX = """
+CREATE INDEX product_search_idx ON products_product USING gin (search_vector);
+"""
+
+DROP_SEARCH_INDEX = """
+DROP INDEX product_search_idx;
+"""
+
+
+def postgresql_only(sql):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            postgresql_only(CREATE_SEARCH_TRIGGER),
+            postgresql_only(DROP_SEARCH_TRIGGER),
+        ),
+        # Other databases keep the column for the model but have no index on
+        # it; ProductManager.search does not use it there.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(
+                    postgresql_only(CREATE_SEARCH_INDEX),
+                    postgresql_only(DROP_SEARCH_INDEX),
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='product',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-17 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
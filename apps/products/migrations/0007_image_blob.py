@@ -0,0 +1,44 @@
+# Generated by Django 5.0.4 on 2026-10-17 11:03
+
+import apps.products.storage.content_addressed_storage
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_image_derivatives'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_staff', models.BooleanField(default=False)),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('reference_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(storage=apps.products.storage.content_addressed_storage.get_image_storage, upload_to='product_image/'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['image'], name='product_image_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imageblob',
+            index=models.Index(condition=models.Q(('reference_count__lte', 0)), fields=['updated_at'], name='image_blob_unreferenced_idx'),
+        ),
+    ]
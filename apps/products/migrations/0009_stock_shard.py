@@ -0,0 +1,37 @@
+# Generated by Django 5.0.4 on 2026-10-17 11:22
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_reservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock_shard_count',
+            field=models.PositiveSmallIntegerField(db_default=0, default=0),
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_staff', models.BooleanField(default=False)),
+                ('index', models.PositiveSmallIntegerField()),
+                ('stock', models.IntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='products.product')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='stockshard',
+            constraint=models.UniqueConstraint(fields=('product', 'index'), name='stock_shard_unique_index'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.4 on 2026-10-17 12:10
+
+from django.db import migrations
+
+# `UPDATE OF name, description` fires whenever either column is in the SET
+# list, which includes every full `Product.save()`. Updates now only rebuild
+# the search vector when the text actually changed.
+REPLACE_SEARCH_TRIGGER = """
+DROP TRIGGER products_product_search_vector_trigger ON products_product;
+
+CREATE TRIGGER products_product_search_vector_trigger
+    BEFORE INSERT ON products_product
+    FOR EACH ROW EXECUTE FUNCTION products_product_search_vector_update();
+
+CREATE TRIGGER products_product_search_vector_update_trigger
+    BEFORE UPDATE OF name, description ON products_product
+    FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.description IS DISTINCT FROM NEW.description)
+    EXECUTE FUNCTION products_product_search_vector_update();
+"""
+
+RESTORE_SEARCH_TRIGGER = """
+DROP TRIGGER products_product_search_vector_update_trigger ON products_product;
+DROP TRIGGER products_product_search_vector_trigger ON products_product;
+
+CREATE TRIGGER products_product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description ON products_product
+    FOR EACH ROW EXECUTE FUNCTION products_product_search_vector_update();
+"""
+
+
+def postgresql_only(sql):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_purchase_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            postgresql_only(REPLACE_SEARCH_TRIGGER),
+            postgresql_only(RESTORE_SEARCH_TRIGGER),
+        ),
+    ]
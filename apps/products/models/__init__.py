@@ -1 +1,5 @@
+from apps.products.models.image_blob import ImageBlob
 from apps.products.models.product import Product
+from apps.products.models.purchase import Purchase
+from apps.products.models.reservation import Reservation
+from apps.products.models.stock_shard import StockShard
@@ -0,0 +1,29 @@
+from django.db import models
+
+from apps.default.models.base_model import BaseModel
+from apps.products.models.image_blob_manager import ImageBlobManager
+
+
+class ImageBlob(BaseModel):
+    """
+    A distinct image file, stored once under the digest of its content and
+    shared by every product uploading the same bytes.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    reference_count = models.IntegerField(default=0)
+
+    objects = ImageBlobManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['updated_at'],
+                condition=models.Q(reference_count__lte=0),
+                name='image_blob_unreferenced_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
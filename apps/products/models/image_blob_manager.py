@@ -0,0 +1,74 @@
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+class ImageBlobManager(models.Manager):
+    """Manager for stored image blobs and their reference counts."""
+
+    def retain(self, name):
+        """
+        Count one more product referencing the blob stored as `name`. Names
+        of files that are not blobs are ignored.
+        """
+        if name:
+            self.filter(name=name).update(
+                reference_count=F('reference_count') + 1, updated_at=timezone.now())
+
+    def release(self, name):
+        """
+        Count one product less referencing the blob stored as `name`.
+        """
+        if name:
+            self.filter(name=name).update(
+                reference_count=F('reference_count') - 1, updated_at=timezone.now())
+
+    def recount(self):
+        """
+        Recompute every reference count from the product table, repairing
+        counts that writes bypassing `Product.save` left behind. Returns
+        the number of blobs whose count changed.
+        """
+        Product = apps.get_model('products', 'Product')
+        references = Product.objects.filter(image=OuterRef('name')).order_by().values(
+            'image').annotate(total=Count('pk')).values('total')
+        count = Coalesce(Subquery(references), Value(0))
+        return self.annotate(actual=count).exclude(reference_count=F('actual')).update(
+            reference_count=count)
+
+    def delete_unreferenced(self, storage, before, batch_size=500):
+        """
+        Delete one batch of blobs that no product references and that were
+        last touched `before` the given time, files included.
+
+        The grace period protects blobs just uploaded for a product that is
+        not saved yet. Rows are locked while their files are deleted, so an
+        upload of the same content waits and then writes the blob again.
+        Blobs found still referenced get their count repaired instead.
+        Returns the number of blobs examined, blobs deleted and bytes freed.
+        """
+        Product = apps.get_model('products', 'Product')
+        with transaction.atomic(using=self.db):
+            blobs = list(
+                self.select_for_update(skip_locked=True)
+                    .filter(reference_count__lte=0, updated_at__lt=before)
+                    .order_by('updated_at')
+                    .only('id', 'name', 'size')[:batch_size]
+            )
+            # Reference counts are only a hint: never delete a blob that a
+            # product still points at.
+            references = dict(
+                Product.objects.filter(image__in=[blob.name for blob in blobs])
+                               .order_by().values('image').annotate(total=Count('pk'))
+                               .values_list('image', 'total')
+            )
+            for name, total in references.items():
+                self.filter(name=name).update(reference_count=total)
+
+            unreferenced = [blob for blob in blobs if blob.name not in references]
+            for blob in unreferenced:
+                storage.delete(blob.name)
+            self.filter(pk__in=[blob.pk for blob in unreferenced]).delete()
+        return len(blobs), len(unreferenced), sum(blob.size for blob in unreferenced)
@@ -1,6 +1,12 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 
 from apps.default.models.base_model import BaseModel
+from apps.products.images.image_pipeline import image_pipeline
+from apps.products.models.image_blob import ImageBlob
+from apps.products.models.product_manager import ProductManager
+from apps.products.storage.content_addressed_storage import get_image_storage
 from apps.users.models.user import User
 
 
@@ -10,7 +16,118 @@ class Product(BaseModel):
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.IntegerField()
-    image = models.ImageField(upload_to='product_image/')
+    # Number of StockShard counters the stock is split across; 0 keeps the
+    # whole stock in `stock`. While sharded, `stock` is a snapshot of the
+    # shard total, refreshed by `ProductManager.refresh_sharded_stock`.
+    stock_shard_count = models.PositiveSmallIntegerField(default=0, db_default=0)
+    # Buying a product with queued purchases only records a pending Purchase;
+    # `stock` catches up when the purchase queue is applied.
+    queue_purchases = models.BooleanField(default=False, db_default=False)
+    image = models.ImageField(upload_to='product_image/', storage=get_image_storage)
+    # Resized copies of `image`, as {size: {format: file name}}. Filled in
+    # the background by the image derivative pipeline.
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ProductManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='product_active_created_idx',
+            ),
+            models.Index(
+                fields=['user', 'is_active'],
+                name='product_user_active_idx',
+            ),
+            models.Index(
+                fields=['price', 'id'],
+                condition=models.Q(is_active=True),
+                name='product_active_price_idx',
+            ),
+            models.Index(
+                fields=['stock', 'id'],
+                condition=models.Q(is_active=True),
+                name='product_active_stock_idx',
+            ),
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(is_active=True, stock__gt=0),
+                name='product_in_stock_created_idx',
+            ),
+            models.Index(
+                fields=['price', 'id'],
+                condition=models.Q(is_active=True, stock__gt=0),
+                name='product_in_stock_price_idx',
+            ),
+            models.Index(
+                fields=['image'],
+                name='product_image_idx',
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='product_search_idx',
+            ),
+        ]
+
+    # Image file name as last loaded from or saved to the database, None when
+    # the image column was deferred.
+    _stored_image = ''
 
     def __str__(self):
         return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_image = instance._get_image_name()
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save the product and move the image blob reference counts along
+        with a changed image. The derivatives of a replaced image are
+        deleted once the change is committed.
+
+        Updates never write `search_vector`: the database trigger maintains
+        it, and an instance that was created rather than loaded still holds
+        None for it.
+        """
+        using = kwargs.get('using')
+        if (not args and not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'search_vector'
+                and field.attname in self.__dict__
+            ]
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            image = self._get_image_name()
+            if image is not None and image != self._stored_image:
+                ImageBlob.objects.retain(image)
+                ImageBlob.objects.release(self._stored_image)
+                if self._stored_image != '':
+                    self.collect_image_derivatives(using)
+                self._stored_image = image
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using')
+        with transaction.atomic(using=using):
+            self.collect_image_derivatives(using)
+            result = super().delete(*args, **kwargs)
+            ImageBlob.objects.release(self._stored_image)
+            self._stored_image = ''
+        return result
+
+    def collect_image_derivatives(self, using=None):
+        pk = self.pk
+        transaction.on_commit(lambda: image_pipeline.collect(pk), using=using)
+
+    def _get_image_name(self):
+        value = self.__dict__.get('image', models.DEFERRED)
+        if value is models.DEFERRED:
+            return None
+        return getattr(value, 'name', value) or ''
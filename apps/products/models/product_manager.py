@@ -0,0 +1,335 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections, models, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+class ProductManager(models.Manager):
+    """Manager for products with race-free stock updates and full-text search."""
+
+    # Text search configuration of the `search_vector` column, which a
+    # database trigger keeps up to date (see migration 0004).
+    search_config = 'english'
+
+    def get_queryset(self):
+        """
+        Leave the search vector out of regular queries; only the search needs it.
+        """
+        return super().get_queryset().defer('search_vector')
+
+    def search(self, text):
+        """
+        Return the active products matching `text`, best matches first.
+
+        PostgreSQL uses the indexed full-text search; other databases fall
+        back to the substring search, so search also works locally.
+        """
+        if connections[self.db].vendor == 'postgresql':
+            return self.full_text_search(text)
+        return self.substring_search(text)
+
+    def full_text_search(self, text):
+        """
+        Search the GIN indexed `search_vector` column and rank the matches
+        with `ts_rank`, name matches weighing more than description matches.
+        `text` supports quoted phrases, `or` and `-word` exclusions.
+        """
+        query = SearchQuery(text, config=self.search_config, search_type='websearch')
+        return self.get_queryset().filter(is_active=True, search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', 'id')
+
+    def substring_search(self, text):
+        """
+        Match every word of `text` as a case insensitive substring of the
+        name or description, ranked like `full_text_search`. This scans the
+        whole table and is only meant for databases without full-text search.
+        """
+        words = text.split()
+        if not words:
+            return self.none()
+
+        condition = Q()
+        rank = Value(0)
+        for word in words:
+            condition &= Q(name__icontains=word) | Q(description__icontains=word)
+            rank += Case(When(name__icontains=word, then=Value(2)), default=Value(0),
+                         output_field=IntegerField())
+            rank += Case(When(description__icontains=word, then=Value(1)), default=Value(0),
+                         output_field=IntegerField())
+        return self.get_queryset().filter(condition, is_active=True).annotate(
+            rank=rank
+        ).order_by('-rank', 'id')
+
+    def decrement_stock(self, pk, quantity=1):
+        """
+        Take `quantity` units from the stock of an active product.
+
+        Unsharded products are served by the single statement of
+        `take_stock`; sharded ones by `decrement_sharded_stock`. Returns the
+        remaining stock, or None when the product does not exist, is
+        inactive or does not have enough stock.
+        """
+        outcome, remaining_stock = self.take_stock(pk, quantity)
+        if outcome == 'sharded':
+            return self.decrement_sharded_stock(pk, quantity)
+        return remaining_stock
+
+    def take_stock(self, pk, quantity=1, skip_queued=False):
+        """
+        Decrement the stock of an active, unsharded product and report how
+        the product is served, in one statement on PostgreSQL.
+
+        The check and the decrement happen in a single conditional UPDATE, so
+        concurrent buyers can never take more units than are left and only
+        the stock and updated_at columns are written. The same statement
+        reads the stock mode of the product, so callers go straight to the
+        shard or queue path without probing the product again. With
+        `skip_queued`, products with queued purchases are left alone, for the
+        caller to queue instead.
+
+        Returns an `(outcome, remaining_stock)` tuple, `outcome` being one of
+        'purchased', 'not_found', 'out_of_stock', 'sharded' or, with
+        `skip_queued`, 'queued'. Only 'purchased' comes with a stock.
+        """
+        connection = connections[self.db]
+        opts = self.model._meta
+        qn = connection.ops.quote_name
+        columns = dict(
+            table=qn(opts.db_table),
+            stock=qn(opts.get_field('stock').column),
+            updated_at=qn(opts.get_field('updated_at').column),
+            pk=qn(opts.pk.column),
+            is_active=qn(opts.get_field('is_active').column),
+            shard_count=qn(opts.get_field('stock_shard_count').column),
+            queue_purchases=qn(opts.get_field('queue_purchases').column),
+        )
+        update = (
+            'UPDATE {table} SET {stock} = {stock} - %s, {updated_at} = %s '
+            'WHERE {pk} = %s AND {is_active} AND {stock} >= %s AND {shard_count} = 0 '
+            + ('AND NOT {queue_purchases} ' if skip_queued else '') +
+            'RETURNING {stock}'
+        )
+        product_id = opts.pk.get_db_prep_value(pk, connection)
+        params = [
+            quantity,
+            opts.get_field('updated_at').get_db_prep_value(timezone.now(), connection),
+            product_id,
+            quantity,
+        ]
+
+        if connection.vendor == 'postgresql':
+            # The mode probe and the UPDATE share one snapshot; the probe
+            # sees the row as it was before the decrement.
+            sql = (
+                'WITH product AS ('
+                '  SELECT {shard_count}, {queue_purchases} FROM {table}'
+                '  WHERE {pk} = %s AND {is_active}'
+                '), decremented AS (' + update + ') '
+                'SELECT (SELECT {stock} FROM decremented), {shard_count}, {queue_purchases} '
+                'FROM product'
+            ).format(**columns)
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [product_id, *params])
+                row = cursor.fetchone()
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(update.format(**columns), params)
+                decremented = cursor.fetchone()
+            if decremented:
+                return 'purchased', decremented[0]
+            mode = self.filter(pk=pk, is_active=True).values_list(
+                'stock_shard_count', 'queue_purchases').first()
+            row = (None, *mode) if mode else None
+
+        if row is None:
+            return 'not_found', None
+        remaining_stock, shard_count, queue_purchases = row
+        if remaining_stock is not None:
+            return 'purchased', remaining_stock
+        if shard_count:
+            return 'sharded', None
+        if skip_queued and queue_purchases:
+            return 'queued', None
+        return 'out_of_stock', None
+
+    def decrement_sharded_stock(self, pk, quantity=1):
+        """
+        Take `quantity` units from one stock shard of a sharded product.
+
+        A random shard with enough stock that no other purchase is writing
+        is picked, so up to `stock_shard_count` purchases proceed in
+        parallel. When every candidate is busy, the fullest one is waited
+        for. A single purchase is served by a single shard.
+
+        Returns the remaining stock over all shards, summed without locking,
+        or None when the product is not an active sharded product or no
+        shard has enough stock.
+        """
+        if connections[self.db].vendor == 'postgresql':
+            remaining_stock = self.decrement_free_shard(pk, quantity)
+            if remaining_stock is not None:
+                return remaining_stock
+
+        if not self.filter(pk=pk, is_active=True, stock_shard_count__gt=0).exists():
+            return None
+
+        shards = self.stock_shards(pk).filter(stock__gte=quantity)
+        with transaction.atomic(using=self.db):
+            shard = shards.select_for_update(skip_locked=True).order_by('?').only('id').first()
+            while shard is None:
+                if not shards.exists():
+                    return None
+                # The lock re-checks the stock of the shard once it is granted.
+                shard = shards.select_for_update().order_by('-stock').only('id').first()
+            shards.filter(pk=shard.pk).update(stock=F('stock') - quantity, updated_at=timezone.now())
+        return self.get_sharded_stock(pk)
+
+    def decrement_free_shard(self, pk, quantity=1):
+        """
+        Decrement a random unlocked shard with enough stock and sum the
+        remaining stock, all in one PostgreSQL statement. Returns None when
+        every such shard is busy, there is none or the product is inactive.
+        """
+        connection = connections[self.db]
+        StockShard = self.model._meta.get_field('stock_shards').related_model
+        opts = StockShard._meta
+        product_opts = self.model._meta
+        qn = connection.ops.quote_name
+
+        # The RETURNING subquery sees the shards as they were before the update.
+        sql = (
+            'UPDATE {table} SET {stock} = {stock} - %s, {updated_at} = %s '
+            'WHERE {pk} = ('
+            '  SELECT {pk} FROM {table} WHERE {product} = %s AND {stock} >= %s'
+            '  AND EXISTS (SELECT 1 FROM {product_table}'
+            '              WHERE {product_pk} = %s AND {is_active})'
+            '  ORDER BY random() LIMIT 1 FOR UPDATE SKIP LOCKED'
+            ') '
+            'RETURNING (SELECT SUM({stock}) FROM {table} WHERE {product} = %s) - %s'
+        ).format(
+            table=qn(opts.db_table),
+            stock=qn(opts.get_field('stock').column),
+            updated_at=qn(opts.get_field('updated_at').column),
+            pk=qn(opts.pk.column),
+            product=qn(opts.get_field('product').column),
+            product_table=qn(product_opts.db_table),
+            product_pk=qn(product_opts.pk.column),
+            is_active=qn(product_opts.get_field('is_active').column),
+        )
+        product_id = opts.get_field('product').get_db_prep_value(pk, connection)
+        params = [
+            quantity,
+            opts.get_field('updated_at').get_db_prep_value(timezone.now(), connection),
+            product_id,
+            quantity,
+            product_id,
+            product_id,
+            quantity,
+        ]
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def get_sharded_stock(self, pk):
+        return self.stock_shards(pk).aggregate(total=Coalesce(Sum('stock'), 0))['total']
+
+    def stock_shards(self, pk):
+        StockShard = self.model._meta.get_field('stock_shards').related_model
+        return StockShard.objects.filter(product_id=pk)
+
+    def shard_stock(self, pk, shards, stock=None):
+        """
+        Split the stock of a product across `shards` counters, or gather it
+        back in `Product.stock` when `shards` is 0. A given `stock` replaces
+        the current total before it is split.
+        """
+        StockShard = self.model._meta.get_field('stock_shards').related_model
+        with transaction.atomic(using=self.db):
+            product = self.select_for_update().get(pk=pk)
+            existing = self.stock_shards(pk).select_for_update()
+            if stock is not None:
+                product.stock = stock
+            elif product.stock_shard_count:
+                product.stock = existing.aggregate(total=Coalesce(Sum('stock'), 0))['total']
+            existing.delete()
+
+            total = product.stock
+            StockShard.objects.bulk_create(
+                StockShard(product=product, index=index,
+                           stock=total // shards + (index < total % shards))
+                for index in range(shards)
+            )
+            product.stock_shard_count = shards
+            product.save(update_fields=['stock', 'stock_shard_count', 'updated_at'])
+        return product
+
+    def refresh_sharded_stock(self):
+        """
+        Copy the shard totals of the sharded products into their `stock`
+        snapshot, with one UPDATE. Returns the number of products changed.
+        """
+        StockShard = self.model._meta.get_field('stock_shards').related_model
+        totals = StockShard.objects.filter(product=OuterRef('pk')).order_by().values(
+            'product').annotate(total=Sum('stock')).values('total')
+        total = Coalesce(Subquery(totals), 0)
+        return self.filter(stock_shard_count__gt=0).annotate(total=total).exclude(
+            stock=F('total')).update(stock=total, updated_at=timezone.now())
+
+    def checkout(self, quantities):
+        """
+        Take stock from several active products in one transaction.
+
+        `quantities` maps product ids to the number of units to take. Rows
+        are locked in primary key order, so overlapping carts always wait on
+        each other in the same order and can never deadlock. Stock is only
+        taken when every product can be served; all the decrements are then
+        written with one bulk update. Sharded products take their units from
+        a shard, which is rolled back with the rest when the cart fails.
+
+        Returns a `(completed, results)` tuple where `results` holds the
+        outcome of every product, keyed by product id.
+        """
+        with transaction.atomic(using=self.db):
+            products = {
+                product.pk: product
+                for product in self.select_for_update()
+                                   .filter(pk__in=quantities, is_active=True)
+                                   .order_by('pk')
+                                   .only('id', 'stock', 'stock_shard_count')
+            }
+
+            results = {}
+            for pk, quantity in quantities.items():
+                product = products.get(pk)
+                if product is None:
+                    results[pk] = {'status': 'not_found'}
+                elif product.stock_shard_count:
+                    remaining_stock = self.decrement_sharded_stock(pk, quantity)
+                    if remaining_stock is None:
+                        results[pk] = {'status': 'out_of_stock',
+                                       'available_stock': self.get_sharded_stock(pk)}
+                    else:
+                        results[pk] = {'status': 'purchased', 'remaining_stock': remaining_stock}
+                elif product.stock < quantity:
+                    results[pk] = {'status': 'out_of_stock', 'available_stock': product.stock}
+                else:
+                    results[pk] = {'status': 'purchased',
+                                   'remaining_stock': product.stock - quantity}
+
+            completed = all(result['status'] == 'purchased' for result in results.values())
+            if completed:
+                now = timezone.now()
+                unsharded = [product for product in products.values()
+                             if not product.stock_shard_count]
+                for product in unsharded:
+                    product.stock -= quantities[product.pk]
+                    product.updated_at = now
+                self.bulk_update(unsharded, ['stock', 'updated_at'])
+            else:
+                transaction.set_rollback(True, using=self.db)
+
+        return completed, results
@@ -0,0 +1,35 @@
+from django.db import models
+
+from apps.default.models.base_model import BaseModel
+from apps.products.models.product import Product
+from apps.products.models.purchase_manager import PurchaseManager
+from apps.users.models.user import User
+
+
+class Purchase(BaseModel):
+    """
+    A purchase of a product with queued purchases, waiting in the purchase
+    queue until `apply_purchases` takes its units from stock or rejects it
+    for lack of stock.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending'
+        APPLIED = 'applied'
+        REJECTED = 'rejected'
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+
+    objects = PurchaseManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(status='pending'),
+                name='purchase_pending_idx',
+            ),
+        ]
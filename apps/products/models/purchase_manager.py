@@ -0,0 +1,98 @@
+from django.db import connections, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+class PurchaseManager(models.Manager):
+    """Manager for the write-behind purchase queue."""
+
+    def enqueue(self, product_id, user, quantity=1):
+        """
+        Queue a purchase of `quantity` units of an active, unsharded product
+        with queued purchases.
+
+        The product check and the insert are a single INSERT ... SELECT, so
+        the product row is read but never locked or written. Returns the
+        pending purchase, or None when the product does not queue purchases.
+        """
+        connection = connections[self.db]
+        opts = self.model._meta
+        product_opts = opts.get_field('product').related_model._meta
+        qn = connection.ops.quote_name
+
+        purchase = self.model(product_id=product_id, user=user, quantity=quantity)
+        fields = opts.concrete_fields
+        sql = (
+            'INSERT INTO {table} ({columns}) SELECT {values} FROM {product_table} '
+            'WHERE {product_pk} = %s AND {is_active} AND {queue_purchases} AND {shard_count} = 0'
+        ).format(
+            table=qn(opts.db_table),
+            columns=', '.join(qn(field.column) for field in fields),
+            values=', '.join(['%s'] * len(fields)),
+            product_table=qn(product_opts.db_table),
+            product_pk=qn(product_opts.pk.column),
+            is_active=qn(product_opts.get_field('is_active').column),
+            queue_purchases=qn(product_opts.get_field('queue_purchases').column),
+            shard_count=qn(product_opts.get_field('stock_shard_count').column),
+        )
+        params = [
+            field.get_db_prep_save(field.pre_save(purchase, True), connection)
+            for field in fields
+        ]
+        params.append(product_opts.pk.get_db_prep_value(product_id, connection))
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            if not cursor.rowcount:
+                return None
+        purchase._state.adding = False
+        purchase._state.db = self.db
+        return purchase
+
+    def apply_pending(self, batch_size=1000):
+        """
+        Apply one batch of pending purchases, oldest first.
+
+        The products of the batch are locked in primary key order and every
+        product gets the sum of its accepted purchases in one UPDATE.
+        Purchases are accepted in queue order while the stock lasts; the
+        rest, and those of inactive or sharded products, are rejected.
+        Rows locked by a concurrent worker are skipped.
+
+        Returns an `(applied, rejected, product_ids)` tuple.
+        """
+        Product = self.model._meta.get_field('product').related_model
+        now = timezone.now()
+        with transaction.atomic(using=self.db):
+            pending = list(
+                self.select_for_update(skip_locked=True)
+                    .filter(status=self.model.Status.PENDING)
+                    .order_by('created_at')
+                    .values_list('pk', 'product_id', 'quantity')[:batch_size]
+            )
+            if not pending:
+                return 0, 0, []
+
+            stocks = dict(
+                Product.objects.select_for_update()
+                               .filter(pk__in={product_id for _, product_id, _ in pending},
+                                       is_active=True, stock_shard_count=0)
+                               .order_by('pk')
+                               .values_list('pk', 'stock')
+            )
+            applied, rejected, taken = [], [], {}
+            for pk, product_id, quantity in pending:
+                stock = stocks.get(product_id)
+                if stock is not None and stock >= quantity:
+                    stocks[product_id] = stock - quantity
+                    taken[product_id] = taken.get(product_id, 0) + quantity
+                    applied.append(pk)
+                else:
+                    rejected.append(pk)
+
+            self.filter(pk__in=applied).update(status=self.model.Status.APPLIED, updated_at=now)
+            self.filter(pk__in=rejected).update(status=self.model.Status.REJECTED, updated_at=now)
+            for product_id, quantity in taken.items():
+                Product.objects.filter(pk=product_id).update(
+                    stock=F('stock') - quantity, updated_at=now)
+        return len(applied), len(rejected), list(taken)
@@ -0,0 +1,36 @@
+from django.db import models
+
+from apps.default.models.base_model import BaseModel
+from apps.products.models.product import Product
+from apps.products.models.reservation_manager import ReservationManager
+from apps.users.models.user import User
+
+
+class Reservation(BaseModel):
+    """
+    Units of a product held for a user until `expires_at`. Confirming the
+    reservation completes the purchase; otherwise the sweeper returns the
+    units to stock once it expires.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending'
+        CONFIRMED = 'confirmed'
+        EXPIRED = 'expired'
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    expires_at = models.DateTimeField()
+
+    objects = ReservationManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['expires_at'],
+                condition=models.Q(status='pending'),
+                name='reservation_pending_idx',
+            ),
+        ]
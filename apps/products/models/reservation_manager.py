@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+
+class ReservationManager(models.Manager):
+    """Manager for time-limited stock reservations."""
+
+    def reserve(self, product_id, user, quantity, ttl):
+        """
+        Take `quantity` units of an active product out of its stock and hold
+        them for `user` during `ttl` seconds.
+
+        The stock is decremented once, by the same conditional UPDATE as a
+        purchase, so the contended row is only written once per
+        reservation. Returns `(reservation, remaining_stock)`, or
+        `(None, None)` when the product is missing, inactive or short of stock.
+        """
+        Product = self.model._meta.get_field('product').related_model
+        with transaction.atomic(using=self.db):
+            remaining_stock = Product.objects.decrement_stock(product_id, quantity)
+            if remaining_stock is None:
+                return None, None
+            reservation = self.create(
+                product_id=product_id, user=user, quantity=quantity,
+                expires_at=timezone.now() + timedelta(seconds=ttl),
+            )
+        return reservation, remaining_stock
+
+    def confirm(self, pk, user):
+        """
+        Turn a pending, unexpired reservation of `user` into a purchase.
+        Returns whether the reservation was confirmed.
+
+        The check and the update are one conditional UPDATE, so a
+        reservation being released by the sweeper can never be confirmed.
+        """
+        return bool(self.filter(
+            pk=pk, user=user, status=self.model.Status.PENDING, expires_at__gt=timezone.now(),
+        ).update(status=self.model.Status.CONFIRMED, updated_at=timezone.now()))
+
+    def release_expired(self, batch_size=1000):
+        """
+        Expire one batch of lapsed pending reservations and return their
+        units to stock, with one UPDATE for all the products of the batch
+        (and one for the shards of the sharded ones).
+
+        Rows locked by a concurrent sweeper or confirmation are skipped.
+        Returns the ids of the products whose stock was restored.
+        """
+        Product = self.model._meta.get_field('product').related_model
+        now = timezone.now()
+        with transaction.atomic(using=self.db):
+            expired = list(
+                self.select_for_update(skip_locked=True)
+                    .filter(status=self.model.Status.PENDING, expires_at__lte=now)
+                    .order_by('expires_at')
+                    .values_list('pk', 'product_id', 'quantity')[:batch_size]
+            )
+            if not expired:
+                return []
+
+            quantities = {}
+            for _, product_id, quantity in expired:
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+            self.filter(pk__in=[pk for pk, _, _ in expired]).update(
+                status=self.model.Status.EXPIRED, updated_at=now)
+            Product.objects.filter(pk__in=quantities, stock_shard_count=0).update(
+                stock=F('stock') + Case(
+                    *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+                    output_field=models.IntegerField(),
+                ),
+                updated_at=now,
+            )
+            # Sharded products get their units back in their first shard.
+            StockShard = Product._meta.get_field('stock_shards').related_model
+            StockShard.objects.filter(product_id__in=quantities, index=0).update(
+                stock=F('stock') + Case(
+                    *[When(product_id=pk, then=Value(quantity))
+                      for pk, quantity in quantities.items()],
+                    output_field=models.IntegerField(),
+                ),
+                updated_at=now,
+            )
+        return list(quantities)
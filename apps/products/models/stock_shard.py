@@ -0,0 +1,19 @@
+from django.db import models
+
+from apps.default.models.base_model import BaseModel
+from apps.products.models.product import Product
+
+
+class StockShard(BaseModel):
+    """
+    One of the counters the stock of a sharded product is split across, so
+    concurrent purchases lock different rows.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_shards')
+    index = models.PositiveSmallIntegerField()
+    stock = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'index'], name='stock_shard_unique_index'),
+        ]
@@ -0,0 +1,19 @@
+from rest_framework import serializers
+
+
+class CheckoutItemSerializer(serializers.Serializer):
+    product = serializers.UUIDField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class CheckoutSerializer(serializers.Serializer):
+    items = CheckoutItemSerializer(many=True, allow_empty=False, max_length=100)
+
+    def validate_items(self, items):
+        """
+        Ensure every product appears only once in the cart.
+        """
+        products = [item['product'] for item in items]
+        if len(products) != len(set(products)):
+            raise serializers.ValidationError("Each product can only appear once.")
+        return items
@@ -0,0 +1,13 @@
+from rest_framework import serializers
+
+
+class ProductFilterSerializer(serializers.Serializer):
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    min_stock = serializers.IntegerField(required=False)
+    max_stock = serializers.IntegerField(required=False)
+    in_stock = serializers.BooleanField(required=False)
+    ordering = serializers.ChoiceField(
+        choices=['created_at', '-created_at', 'price', '-price', 'stock', '-stock'],
+        required=False,
+    )
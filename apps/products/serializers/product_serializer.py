@@ -1,11 +1,38 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.encoding import filepath_to_uri
+
 from rest_framework import serializers
 
+from apps.default.serializers.dynamic_fields_serializer import DynamicFieldsModelSerializer
 from apps.products.models.product import Product
 from apps.users.models.user import User
 
 
-class ProductSerializer(serializers.ModelSerializer):
+def image_derivative_urls(image, derivatives, url):
+    """
+    Map every configured derivative size and format of a product image to
+    its URL, built with `url` from a stored file name.
+
+    Derivatives are generated in the background after an upload; until a
+    derivative is ready its entry points at the original image.
+    """
+    if not image:
+        return None
+    config = settings.PRODUCT_IMAGE_DERIVATIVES
+    return {
+        size: {
+            name: url(derivatives.get(size, {}).get(name) or image)
+            for name in config['FORMATS']
+        }
+        for size in config['SIZES']
+    }
+
+
+class ProductSerializer(DynamicFieldsModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
+    image_derivatives = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
@@ -15,12 +42,24 @@ class ProductSerializer(serializers.ModelSerializer):
                   'description',
                   'price',
                   'stock',
-                  'image'
+                  'image',
+                  'image_derivatives',
                 ]
         extra_kwargs = {
             'image': {'required': False}
         }
 
+    def get_image_derivatives(self, product):
+        storage = product.image.storage
+        request = self.context.get('request')
+
+        def url(name):
+            if request is not None:
+                return request.build_absolute_uri(storage.url(name))
+            return storage.url(name)
+
+        return image_derivative_urls(product.image.name, product.image_derivatives, url)
+
     def create(self, validated_data):
         """
         Create a new product instance.
@@ -40,4 +79,102 @@ class ProductSerializer(serializers.ModelSerializer):
         for field in ['user', 'id']:
             validated_data.pop(field, None)
 
-        return super(ProductSerializer, self).update(instance, validated_data)
+        if 'image' in validated_data:
+            # The derivatives of the previous image no longer apply.
+            validated_data['image_derivatives'] = {}
+
+        with transaction.atomic():
+            if instance.stock_shard_count and 'stock' in validated_data:
+                # The stock of a sharded product lives in its shards; re-split
+                # the new total so `refresh_sharded_stock` keeps it.
+                instance.stock = Product.objects.shard_stock(
+                    instance.pk, instance.stock_shard_count, stock=validated_data.pop('stock')).stock
+            return super(ProductSerializer, self).update(instance, validated_data)
+
+
+class ProductValuesSerializer:
+    """
+    Read-only fast path for serializing product lists.
+
+    Renders rows fetched with `.values()` straight to the `ProductSerializer`
+    representation, skipping model instance construction and the per-field
+    DRF machinery. Use `values()` to fetch the rows it expects.
+    """
+    columns = {
+        'id': 'id',
+        'user': 'user_id',
+        'name': 'name',
+        'description': 'description',
+        'price': 'price',
+        'stock': 'stock',
+        'image': 'image',
+        'image_derivatives': None,
+    }
+    # Columns of the fields rendered from the whole row rather than from a
+    # column of their own.
+    row_columns = {
+        'image_derivatives': ('image', 'image_derivatives'),
+    }
+
+    def __init__(self, rows, context=None, fields=None):
+        self.rows = rows
+        self.context = context or {}
+        self.fields = fields or list(self.columns)
+
+    @classmethod
+    def values(cls, queryset, fields=None, required=('id', 'created_at')):
+        """
+        Fetch the columns of `fields` (all by default) plus the `required`
+        model fields, such as the ordering columns used for pagination.
+        """
+        columns = []
+        for field in fields or cls.columns:
+            columns.extend(cls.row_columns.get(field, [cls.columns[field]]))
+        return queryset.values(*dict.fromkeys([*columns, *required]))
+
+    @property
+    def data(self):
+        renderers = self.get_renderers()
+        selected = [(field, self.columns[field], renderers.get(field)) for field in self.fields]
+        return [
+            {
+                field: (row[column] if render is None else render(row[column]))
+                if column is not None else render(row)
+                for field, column, render in selected
+            }
+            for row in self.rows
+        ]
+
+    def get_renderers(self):
+        """
+        Return the functions converting column values of the fields whose
+        representation differs from the raw value.
+        """
+        image_url = self.get_image_url_builder()
+        return {
+            'id': str,
+            'price': ProductSerializer().fields['price'].to_representation,
+            'image': lambda name: image_url(name) if name else None,
+            'image_derivatives': lambda row: image_derivative_urls(
+                row['image'], row['image_derivatives'], image_url),
+        }
+
+    def get_image_url_builder(self):
+        """
+        Return a function building the image URL of a stored file name.
+
+        Files on the local filesystem share one URL prefix, which is resolved
+        once per page instead of once per row.
+        """
+        request = self.context.get('request')
+        storage = Product._meta.get_field('image').storage
+
+        if isinstance(storage, FileSystemStorage):
+            prefix = storage.url('')
+            if request is not None:
+                prefix = request.build_absolute_uri(prefix)
+            return lambda name: prefix + filepath_to_uri(name).lstrip('/')
+
+        if request is not None:
+            return lambda name: request.build_absolute_uri(storage.url(name))
+        return storage.url
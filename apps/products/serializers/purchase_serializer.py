@@ -0,0 +1,16 @@
+from rest_framework import serializers
+
+from apps.products.models.purchase import Purchase
+
+
+class PurchaseSerializer(serializers.ModelSerializer):
+    product = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    class Meta:
+        model = Purchase
+        fields = ['id',
+                  'product',
+                  'quantity',
+                  'status'
+                ]
+        read_only_fields = fields
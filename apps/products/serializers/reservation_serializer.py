@@ -0,0 +1,21 @@
+from rest_framework import serializers
+
+from apps.products.models.reservation import Reservation
+
+
+class ReserveSerializer(serializers.Serializer):
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+
+class ReservationSerializer(serializers.ModelSerializer):
+    product = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    class Meta:
+        model = Reservation
+        fields = ['id',
+                  'product',
+                  'quantity',
+                  'status',
+                  'expires_at'
+                ]
+        read_only_fields = fields
@@ -0,0 +1,86 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage keeping a single copy of every distinct file.
+
+    Uploads are hashed while they are streamed to disk chunk by chunk, then
+    stored under their digest, e.g. `product_image/3f/a2/3fa2...c1.jpg`. An
+    upload whose content is already stored is discarded and the existing
+    blob name is returned, so identical photos cost one file and no rewrite.
+
+    Every blob is recorded as an `ImageBlob`, reference counted by the
+    products using it; `collect_image_blobs` deletes the unreferenced ones.
+    """
+    hash_algorithm = 'sha256'
+
+    @property
+    def blobs(self):
+        return apps.get_model('products', 'ImageBlob').objects
+
+    def get_available_name(self, name, max_length=None):
+        # The final name depends on the content only, see `_save`.
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        digest, size, temporary_path = self._write_temporary(directory, content)
+
+        # Touching the row keeps the blob from being collected, and waits
+        # for a collection that is deleting it right now.
+        existing = self.blobs.filter(digest=digest)
+        if existing.update(updated_at=timezone.now()):
+            os.remove(temporary_path)
+            return existing.values_list('name', flat=True).get()
+
+        blob_name = posixpath.join(directory, digest[:2], digest[2:4], digest + extension)
+        path = self.path(blob_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temporary_path, path)
+        if self.file_permissions_mode is not None:
+            os.chmod(path, self.file_permissions_mode)
+
+        blob, _ = self.blobs.get_or_create(
+            digest=digest, defaults={'name': blob_name, 'size': size})
+        if blob.name != blob_name:
+            # A concurrent upload of the same content won, under another extension.
+            os.remove(path)
+        return blob.name
+
+    def _write_temporary(self, directory, content):
+        """
+        Stream `content` to a temporary file next to the blobs, hashing it
+        on the way. Returns the digest, the size and the temporary path.
+        """
+        target = self.path(directory)
+        os.makedirs(target, exist_ok=True)
+
+        hasher = hashlib.new(self.hash_algorithm)
+        size = 0
+        content.seek(0)
+        with tempfile.NamedTemporaryFile(dir=target, prefix='.upload-', delete=False) as file:
+            try:
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    file.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                os.remove(file.name)
+                raise
+        return hasher.hexdigest(), size, file.name
+
+
+def get_image_storage():
+    return image_storage
+
+
+image_storage = ContentAddressedStorage()
@@ -1,12 +1,38 @@
+import io
+import json
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from unittest import skipIf
 
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TransactionTestCase
+from django.test import Client, RequestFactory, TransactionTestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
 from django.conf import settings
+from django.db import connection, transaction
+from django.core.management import call_command
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+
+from PIL import Image
 
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 
+from apps.default.models.idempotency_key import IdempotencyKey
+from apps.products.cache.product_cache import product_cache
+from apps.products.images.image_pipeline import image_pipeline
+from apps.products.models.image_blob import ImageBlob
 from apps.products.models.product import Product
+from apps.products.models.purchase import Purchase
+from apps.products.models.reservation import Reservation
+from apps.products.models.stock_shard import StockShard
+from apps.products.serializers.product_serializer import (
+    ProductSerializer,
+    ProductValuesSerializer,
+)
 from apps.users.models.user import User
 
 
@@ -16,6 +42,8 @@ class ProductViewSetTest(TransactionTestCase):
         Set up the test environment by creating a user and a product for testing.
         """
         self.client = Client()
+        product_cache.cache.clear()
+        product_cache.reset_stats()
         self.user_data = {
             "username": None,
             "first_name": "Kirby",
@@ -40,6 +68,9 @@ class ProductViewSetTest(TransactionTestCase):
         }
         self.product = Product.objects.create(**self.product_data)
 
+    def tearDown(self):
+        image_pipeline.wait()
+
     def login_and_get_token(self):
         """
         Perform a login and return the access token for use in other tests.
@@ -61,6 +92,78 @@ class ProductViewSetTest(TransactionTestCase):
     def test_list_products(self):
         response = self.client.get('/product/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['id'], str(self.product.id))
+        self.assertIsNone(response.data['next'])
+
+    def create_products(self, count):
+        return [
+            Product.objects.create(**{**self.product_data, "name": f"Product {index}"})
+            for index in range(count)
+        ]
+
+    def collect_pages(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_list_products_pagination(self):
+        products = [self.product] + self.create_products(6)
+        ids = self.collect_pages('/product/?page_size=3')
+        self.assertEqual(ids, [str(product.id) for product in products])
+
+    def test_list_products_previous_page(self):
+        self.create_products(4)
+        first_page = self.client.get('/product/?page_size=2').data
+        second_page = self.client.get(first_page['next']).data
+        previous_page = self.client.get(second_page['previous']).data
+        self.assertEqual(previous_page['results'], first_page['results'])
+
+    def test_list_products_stable_under_inserts(self):
+        products = [self.product] + self.create_products(3)
+        first_page = self.client.get('/product/?page_size=2').data
+        new_products = self.create_products(2)
+        ids = [item['id'] for item in first_page['results']]
+        ids += self.collect_pages(first_page['next'])
+        self.assertEqual(ids, [str(product.id) for product in products + new_products])
+
+    @override_settings(KEYSET_PAGINATION={'PAGE_SIZE': 2, 'MAX_PAGE_SIZE': 3})
+    def test_list_products_page_size_cap(self):
+        self.create_products(5)
+        response = self.client.get('/product/')
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get('/product/?page_size=100')
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_list_products_invalid_cursor(self):
+        response = self.client.get('/product/?cursor=invalid')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_products_filtered_and_ordered(self):
+        products = [
+            Product.objects.create(**{**self.product_data, "name": f"Product {index}",
+                                      "price": price, "stock": stock})
+            for index, (price, stock) in enumerate(
+                [(30, 1), (5, 3), (15, 0), (15, 2), (25, 4), (50, 5)])
+        ]
+        ids = self.collect_pages('/product/?min_price=10&max_price=30&in_stock=true'
+                                 '&ordering=-price&page_size=1')
+        expected = sorted((product for product in [self.product] + products
+                           if product.stock and 10 <= product.price <= 30),
+                          key=lambda product: (product.price, product.id), reverse=True)
+        self.assertEqual(ids, [str(product.id) for product in expected])
+
+        ids = self.collect_pages('/product/?max_stock=2&ordering=stock&page_size=2')
+        self.assertEqual(ids, [str(products[index].id) for index in (2, 0, 3)])
+
+    def test_list_products_invalid_filters(self):
+        for query in ('min_price=cheap', 'in_stock=maybe', 'ordering=name'):
+            with self.subTest(query):
+                response = self.client.get(f'/product/?{query}')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_retrieve_product(self):
         response = self.client.get(f'/product/{self.product.id}/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
@@ -90,8 +193,154 @@ class ProductViewSetTest(TransactionTestCase):
             "image": image_file,
         }
 
-        response = self.client.post('/product/create_product/', data=product_data, HTTP_AUTHORIZATION=f'Bearer {self.token}')
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root):
+            response = self.client.post('/product/create_product/', data=product_data, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+            image_pipeline.wait()
+
+    def make_image(self, name, size=(2000, 1000)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_create_product_generates_image_derivatives(self):
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root):
+            response = self.client.post('/product/create_product/', data={
+                "name": "New Product",
+                "description": "New Description",
+                "price": 15.0,
+                "stock": 10,
+                "image": self.make_image('photo.png'),
+            }, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+            original = response.data['image']
+            self.assertEqual(response.data['image_derivatives']['thumbnail'],
+                             {'webp': original, 'jpeg': original})
+
+            image_pipeline.wait()
+            product = Product.objects.get(pk=response.data['id'])
+            stem = os.path.splitext(os.path.basename(product.image.name))[0]
+            response = self.client.get(f'/product/{product.id}/')
+            thumbnail = response.data['image_derivatives']['thumbnail']
+            self.assertTrue(thumbnail['webp'].endswith(f'{stem}-thumbnail.webp'))
+            self.assertTrue(thumbnail['jpeg'].endswith(f'{stem}-thumbnail.jpg'))
+
+            with Image.open(product.image.storage.path(
+                    product.image_derivatives['thumbnail']['webp'])) as image:
+                self.assertEqual(image.size, (160, 80))
+
+            with override_settings(PRODUCT_FAST_LIST_SERIALIZATION=True):
+                product_cache.cache.clear()
+                response = self.client.get('/product/?fields=id,image_derivatives')
+            listed = {item['id']: item for item in response.data['results']}
+            self.assertEqual(listed[str(product.id)]['image_derivatives']['thumbnail'],
+                             thumbnail)
+
+            response = self.client.patch(
+                f'/product/{product.id}/',
+                data=encode_multipart(BOUNDARY, {"image": self.make_image('new.png', (1500, 900))}),
+                content_type=MULTIPART_CONTENT, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+            self.assertEqual(response.data['image_derivatives']['large']['webp'],
+                             response.data['image'])
+            image_pipeline.wait()
+            product.refresh_from_db()
+            stem = os.path.splitext(os.path.basename(product.image.name))[0]
+            self.assertTrue(product.image_derivatives['large']['webp'].endswith(f'{stem}-large.webp'))
+            directory = os.path.join(media_root, settings.PRODUCT_IMAGE_DERIVATIVES['DIRECTORY'],
+                                     str(product.id))
+            self.assertEqual({name.rsplit('-', 1)[0] for name in os.listdir(directory)}, {stem})
+
+            response = self.client.delete(f'/product/{product.id}/',
+                                          HTTP_AUTHORIZATION=f'Bearer {self.token}')
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            image_pipeline.wait()
+            self.assertFalse(os.path.exists(directory))
+
+    def test_identical_images_are_stored_once(self):
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root):
+            names = []
+            for name in ('first.png', 'second.png'):
+                response = self.client.post('/product/create_product/', data={
+                    **self.product_data, "user": "", "image": self.make_image(name, (40, 40)),
+                }, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+                names.append(Product.objects.get(pk=response.data['id']).image.name)
+
+            self.assertEqual(names[0], names[1])
+            blob = ImageBlob.objects.get()
+            self.assertEqual(blob.name, names[0])
+            self.assertEqual(blob.reference_count, 2)
+            self.assertEqual(os.listdir(os.path.dirname(os.path.join(media_root, blob.name))),
+                             [os.path.basename(blob.name)])
+            image_pipeline.wait()
+
+    def test_collect_unreferenced_image_blobs(self):
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root):
+            products = self.create_products(2)
+            for product in products:
+                product.image = self.make_image('photo.png', (40, 40))
+                product.save()
+            path = products[0].image.path
+
+            products[0].delete()
+            call_command('collect_image_blobs', grace_hours=0, stdout=io.StringIO())
+            self.assertEqual(ImageBlob.objects.get().reference_count, 1)
+            self.assertTrue(os.path.exists(path))
+
+            # Deletes that bypass Product.delete() are repaired by a recount.
+            Product.objects.filter(pk=products[1].pk).delete()
+            call_command('collect_image_blobs', grace_hours=0, stdout=io.StringIO())
+            self.assertTrue(os.path.exists(path))
+            call_command('collect_image_blobs', grace_hours=0, recount=True,
+                         stdout=io.StringIO())
+            self.assertFalse(ImageBlob.objects.exists())
+            self.assertFalse(os.path.exists(path))
+
+    def test_import_products_csv(self):
+        content = (
+            "name,description,price,stock\n"
+            "Lamp,Desk lamp,12.50,4\n"
+            "Chair,Office chair,cheap,2\n"
+            "Desk,Standing desk,300,1\n"
+            ",No name,5,5\n"
+            "Mat,Desk mat,9.99,10\n"
+        )
+        file = SimpleUploadedFile('catalog.csv', content.encode(), content_type='text/csv')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/product/import_products/?batch_size=2', data={"file": file},
+                                        HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 4])
+        self.assertIn('price', response.data['errors'][0]['errors'])
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('INSERT')]), 2)
+        self.assertEqual(
+            set(Product.objects.filter(user=self.user).values_list('name', flat=True)),
+            {self.product.name, 'Lamp', 'Desk', 'Mat'})
+
+    def test_import_products_jsonl_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as file:
+            file.write('{"name": "Lamp", "description": "Desk lamp", "price": 12.5, "stock": 4}\n'
+                       'not json\n\n'
+                       '{"name": "Mat", "description": "Desk mat", "price": "9.99", "stock": 10}\n')
+            file.flush()
+            stdout, stderr = io.StringIO(), io.StringIO()
+            call_command('import_products', file.name, user=self.user.email,
+                         stdout=stdout, stderr=stderr)
+        self.assertIn('Created 2 products, 1 rows failed', stdout.getvalue())
+        self.assertIn('Row 2:', stderr.getvalue())
+        self.assertEqual(Product.objects.filter(name__in=['Lamp', 'Mat']).count(), 2)
+
+    def test_import_products_requires_known_format(self):
+        file = SimpleUploadedFile('catalog.xlsx', b'data')
+        response = self.client.post('/product/import_products/', data={"file": file},
+                                    HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_partial_update_product(self):
         updated_data = {
@@ -106,7 +355,551 @@ class ProductViewSetTest(TransactionTestCase):
 
     def test_buy_product(self):
         initial_stock = self.product.stock
-        response = self.client.post(f'/product/{self.product.id}/buy/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/product/{self.product.id}/buy/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['status'], "Product purchased")
         self.assertEqual(response.data['remaining_stock'], initial_stock - 1)
+        # A direct purchase never tries the purchase queue.
+        self.assertFalse([query for query in queries if query['sql'].startswith('INSERT')])
+
+    def test_buy_product_out_of_stock(self):
+        Product.objects.filter(pk=self.product.pk).update(stock=0)
+        response = self.client.post(f'/product/{self.product.id}/buy/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.product.delete()
+        response = self.client.post(f'/product/{self.product.id}/buy/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @skipIf(connection.vendor != 'postgresql', 'The stock mode is only probed in-statement on PostgreSQL.')
+    def test_buy_runs_only_the_statements_of_its_path(self):
+        def product_statements(stock):
+            Product.objects.filter(pk=self.product.pk).update(stock=stock)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(f'/product/{self.product.id}/buy/',
+                                            HTTP_AUTHORIZATION=f'Bearer {self.token}')
+            return response.status_code, len(
+                [query for query in queries if 'products_' in query['sql']])
+
+        self.assertEqual(product_statements(0), (status.HTTP_400_BAD_REQUEST, 1))
+        call_command('queue_purchases', str(self.product.pk), stdout=io.StringIO())
+        self.assertEqual(product_statements(0), (status.HTTP_202_ACCEPTED, 2))
+
+    @skipIf(connection.vendor == 'sqlite', 'SQLite locks the whole table for concurrent writers.')
+    def test_concurrent_buys_never_oversell(self):
+        stock, buyers = 150, 300
+        Product.objects.filter(pk=self.product.pk).update(stock=stock)
+
+        def buy(_):
+            try:
+                return Client().post(f'/product/{self.product.id}/buy/',
+                                     HTTP_AUTHORIZATION=f'Bearer {self.token}').status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            codes = list(executor.map(buy, range(buyers)))
+
+        self.assertEqual(codes.count(status.HTTP_200_OK), stock)
+        self.assertEqual(codes.count(status.HTTP_400_BAD_REQUEST), buyers - stock)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+
+    def test_shard_stock(self):
+        call_command('shard_stock', str(self.product.pk), shards=3, stdout=io.StringIO())
+        self.assertEqual(sorted(StockShard.objects.values_list('stock', flat=True)), [6, 7, 7])
+
+        response = self.client.post(f'/product/{self.product.id}/buy/',
+                                    HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['remaining_stock'], 19)
+
+        call_command('refresh_sharded_stock', stdout=io.StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 19)
+
+        call_command('shard_stock', str(self.product.pk), shards=0, stdout=io.StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.stock_shard_count), (19, 0))
+        self.assertFalse(StockShard.objects.exists())
+
+    def test_update_stock_of_sharded_product(self):
+        Product.objects.shard_stock(self.product.pk, 3)
+        response = self.client.patch(f'/product/{self.product.id}/', data={"stock": 31},
+                                     content_type='application/json',
+                                     HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['stock'], 31)
+        self.assertEqual(sorted(StockShard.objects.values_list('stock', flat=True)), [10, 10, 11])
+
+        call_command('refresh_sharded_stock', stdout=io.StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.stock_shard_count), (31, 3))
+
+    @skipIf(connection.vendor != 'postgresql', 'The stock mode is only probed in-statement on PostgreSQL.')
+    def test_out_of_stock_decrement_is_one_statement(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIsNone(Product.objects.decrement_stock(self.product.pk, quantity=21))
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(Product.objects.take_stock(self.product.pk, quantity=21),
+                         ('out_of_stock', None))
+
+    @skipIf(connection.vendor == 'sqlite', 'SQLite locks the whole table for concurrent writers.')
+    def test_concurrent_sharded_buys_never_oversell(self):
+        stock, buyers = 100, 200
+        Product.objects.filter(pk=self.product.pk).update(stock=stock)
+        Product.objects.shard_stock(self.product.pk, 4)
+
+        def buy(_):
+            try:
+                return Client().post(f'/product/{self.product.id}/buy/',
+                                     HTTP_AUTHORIZATION=f'Bearer {self.token}').status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            codes = list(executor.map(buy, range(buyers)))
+
+        self.assertEqual(codes.count(status.HTTP_200_OK), stock)
+        self.assertEqual(codes.count(status.HTTP_400_BAD_REQUEST), buyers - stock)
+        self.assertEqual(set(StockShard.objects.values_list('stock', flat=True)), {0})
+
+    def test_queued_purchases(self):
+        Product.objects.filter(pk=self.product.pk).update(stock=2)
+        call_command('queue_purchases', str(self.product.pk), stdout=io.StringIO())
+
+        responses = [self.client.post(f'/product/{self.product.id}/buy/',
+                                      HTTP_AUTHORIZATION=f'Bearer {self.token}')
+                     for _ in range(3)]
+        self.assertEqual({response.status_code for response in responses},
+                         {status.HTTP_202_ACCEPTED})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+
+        call_command('apply_purchases', stdout=io.StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+        statuses = [self.client.get(f'/purchase/{response.data["purchase"]["id"]}/',
+                                    HTTP_AUTHORIZATION=f'Bearer {self.token}').data['status']
+                    for response in responses]
+        self.assertEqual(statuses, ['applied', 'applied', 'rejected'])
+        self.assertFalse(Purchase.objects.filter(status='pending').exists())
+
+    def test_buy_with_idempotency_key(self):
+        url = f'/product/{self.product.id}/buy/'
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.token}', 'HTTP_IDEMPOTENCY_KEY': 'buy-1'}
+        first = self.client.post(url, **headers)
+        retry = self.client.post(url, **headers)
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 19)
+
+        self.client.post(url, **{**headers, 'HTTP_IDEMPOTENCY_KEY': 'buy-2'})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 18)
+
+    @skipIf(connection.vendor == 'sqlite', 'SQLite locks the whole table for concurrent writers.')
+    def test_concurrent_duplicate_buys_run_once(self):
+        def buy(_):
+            try:
+                return Client().post(f'/product/{self.product.id}/buy/',
+                                     HTTP_AUTHORIZATION=f'Bearer {self.token}',
+                                     HTTP_IDEMPOTENCY_KEY='same-key').data
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            results = list(executor.map(buy, range(10)))
+
+        self.assertEqual({result['remaining_stock'] for result in results}, {19})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 19)
+
+    @skipIf(connection.vendor == 'sqlite', 'SQLite locks the whole table for concurrent writers.')
+    @override_settings(IDEMPOTENCY={'TTL': 60, 'WAIT': 0.2})
+    def test_duplicate_of_running_request_conflicts(self):
+        url = f'/product/{self.product.id}/buy/'
+
+        def buy():
+            try:
+                return Client().post(url, HTTP_AUTHORIZATION=f'Bearer {self.token}',
+                                     HTTP_IDEMPOTENCY_KEY='slow').status_code
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            key = IdempotencyKey.objects.make_key(f'{self.user.pk}|POST|{url}', 'slow')
+            self.assertTrue(IdempotencyKey.objects.claim(key, '', 1))
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                self.assertEqual(executor.submit(buy).result(), status.HTTP_409_CONFLICT)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 20)
+
+    def test_create_product_with_idempotency_key(self):
+        product_data = {"name": "Retried", "description": "Retried", "price": 15.0, "stock": 10}
+        responses = [
+            self.client.post('/product/create_product/', data=product_data,
+                             HTTP_AUTHORIZATION=f'Bearer {self.token}',
+                             HTTP_IDEMPOTENCY_KEY='create-1')
+            for _ in range(2)
+        ]
+        self.assertEqual([response.status_code for response in responses],
+                         [status.HTTP_201_CREATED, status.HTTP_201_CREATED])
+        self.assertEqual(responses[0].data['id'], responses[1].data['id'])
+        self.assertEqual(Product.objects.filter(name="Retried").count(), 1)
+
+        response = self.client.post('/product/create_product/',
+                                    data={**product_data, "stock": 11},
+                                    HTTP_AUTHORIZATION=f'Bearer {self.token}',
+                                    HTTP_IDEMPOTENCY_KEY='create-1')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Product.objects.filter(name="Retried").count(), 1)
+
+    def test_failed_write_releases_idempotency_key(self):
+        Product.objects.filter(pk=self.product.pk).update(is_active=False)
+        url = f'/product/{self.product.id}/buy/'
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.token}', 'HTTP_IDEMPOTENCY_KEY': 'buy-1'}
+        self.assertEqual(self.client.post(url, **headers).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        Product.objects.filter(pk=self.product.pk).update(is_active=True)
+        response = self.client.post(url, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, status.HTTP_200_OK)
+
+    def test_purge_idempotency_keys(self):
+        url = f'/product/{self.product.id}/buy/'
+        for key in ('buy-1', 'buy-2', 'buy-3'):
+            self.client.post(url, HTTP_AUTHORIZATION=f'Bearer {self.token}', HTTP_IDEMPOTENCY_KEY=key)
+        IdempotencyKey.objects.filter(key=IdempotencyKey.objects.make_key(
+            f'{self.user.pk}|POST|{url}', 'buy-1')).update(expires_at=timezone.now())
+
+        out = io.StringIO()
+        call_command('purge_idempotency_keys', max_keys=1, stdout=out)
+        self.assertIn('Deleted 1 expired and 1 excess', out.getvalue())
+        responses = [self.client.post(url, HTTP_AUTHORIZATION=f'Bearer {self.token}',
+                                      HTTP_IDEMPOTENCY_KEY=key) for key in ('buy-2', 'buy-3')]
+        self.assertEqual([response.data['remaining_stock'] for response in responses], [16, 17])
+
+    def test_retrieve_product_is_cached(self):
+        url = f'/product/{self.product.id}/'
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data['name'], self.product.name)
+        self.assertEqual(product_cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_list_products_is_cached(self):
+        self.client.get('/product/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/product/')
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_partial_update_invalidates_cache(self):
+        url = f'/product/{self.product.id}/'
+        self.client.get(url)
+        self.client.get('/product/')
+        self.client.patch(url, data={"name": "Renamed"}, content_type='application/json',
+                          HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(self.client.get(url).data['name'], "Renamed")
+        self.assertEqual(self.client.get('/product/').data['results'][0]['name'], "Renamed")
+
+    def test_destroy_invalidates_cache(self):
+        url = f'/product/{self.product.id}/'
+        self.client.get(url)
+        self.client.get('/product/')
+        self.client.delete(url, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/product/').data['results'], [])
+
+    def test_create_and_buy_invalidate_cache(self):
+        self.client.get('/product/')
+        self.client.post('/product/create_product/', data={
+            "name": "New Product",
+            "description": "New Description",
+            "price": 15.0,
+            "stock": 10,
+        }, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(len(self.client.get('/product/').data['results']), 2)
+
+        url = f'/product/{self.product.id}/'
+        self.client.get(url)
+        self.client.post(f'{url}buy/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(self.client.get(url).data['stock'], self.product.stock - 1)
+
+    def test_list_products_not_modified(self):
+        response = self.client.get('/product/')
+        self.assertIn('Last-Modified', response)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/product/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('MAX(', queries[0]['sql'])
+        self.assertNotIn('COUNT(', queries[0]['sql'])
+
+    def test_list_products_etag_changes_on_write(self):
+        etag = self.client.get('/product/')['ETag']
+        self.create_products(1)
+        response = self.client.get('/product/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        Product.objects.filter(pk=self.product.pk).delete()
+        response = self.client.get('/product/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_product_not_modified(self):
+        url = f'/product/{self.product.id}/'
+        response = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(url, data={"price": 30.0}, content_type='application/json',
+                          HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['price'], '30.00')
+
+    def test_checkout(self):
+        other = self.create_products(1)[0]
+        data = {"items": [
+            {"product": str(self.product.id), "quantity": 3},
+            {"product": str(other.id), "quantity": 20},
+        ]}
+        response = self.client.post('/product/checkout/', data=data, content_type='application/json',
+                                    HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual([item['remaining_stock'] for item in response.data['items']], [17, 0])
+        other.refresh_from_db()
+        self.assertEqual(other.stock, 0)
+
+    def test_checkout_is_all_or_nothing(self):
+        other = self.create_products(1)[0]
+        data = {"items": [
+            {"product": str(self.product.id), "quantity": 3},
+            {"product": str(other.id), "quantity": 21},
+        ]}
+        response = self.client.post('/product/checkout/', data=data, content_type='application/json',
+                                    HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([item['status'] for item in response.data['items']],
+                         ['purchased', 'out_of_stock'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 20)
+
+    @skipIf(connection.vendor == 'sqlite', 'SQLite locks the whole table for concurrent writers.')
+    def test_concurrent_overlapping_checkouts(self):
+        products = [self.product] + self.create_products(3)
+        Product.objects.update(stock=40)
+
+        def checkout(index):
+            # Every other cart lists the products in reverse order.
+            cart = products if index % 2 else products[::-1]
+            data = {"items": [{"product": str(product.id), "quantity": 1} for product in cart]}
+            try:
+                return Client().post('/product/checkout/', data=data, content_type='application/json',
+                                     HTTP_AUTHORIZATION=f'Bearer {self.token}').status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            codes = list(executor.map(checkout, range(50)))
+
+        self.assertEqual(codes.count(status.HTTP_200_OK), 40)
+        self.assertEqual(codes.count(status.HTTP_400_BAD_REQUEST), 10)
+        self.assertEqual(set(Product.objects.values_list('stock', flat=True)), {0})
+
+    def reserve(self, quantity):
+        return self.client.post(f'/product/{self.product.id}/reserve/', data={"quantity": quantity},
+                                content_type='application/json',
+                                HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def confirm(self, reservation_id):
+        return self.client.post(f'/reservation/{reservation_id}/confirm/',
+                                HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def test_reserve_and_confirm(self):
+        response = self.reserve(5)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['remaining_stock'], 15)
+        reservation_id = response.data['reservation']['id']
+
+        response = self.confirm(reservation_id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.confirm(reservation_id)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        call_command('release_reservations', stdout=io.StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 15)
+
+    def test_reserve_more_than_stock(self):
+        response = self.reserve(21)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Reservation.objects.exists())
+
+    @override_settings(PRODUCT_RESERVATION={'TTL': 0})
+    def test_expired_reservations_return_stock(self):
+        reservations = [self.reserve(quantity).data['reservation']['id'] for quantity in (3, 4)]
+        response = self.confirm(reservations[0])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], "Reservation expired.")
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command('release_reservations', stdout=io.StringIO())
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "products_product"')]
+        self.assertEqual(len(updates), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 20)
+        self.assertEqual(set(Reservation.objects.values_list('status', flat=True)), {'expired'})
+
+    def test_values_serializer_matches_product_serializer(self):
+        self.create_products(2)
+        Product.objects.create(**{**self.product_data, "image": "", "price": 3.5})
+        Product.objects.create(**{**self.product_data, "image": "product_image/my photo ñ.jpg"})
+        request = RequestFactory().get('/product/')
+        queryset = Product.objects.order_by('created_at', 'id')
+
+        expected = ProductSerializer(queryset, many=True, context={'request': request}).data
+        data = ProductValuesSerializer(ProductValuesSerializer.values(queryset),
+                                       context={'request': request}).data
+        self.assertEqual(json.loads(JSONRenderer().render(data)),
+                         json.loads(JSONRenderer().render(expected)))
+
+    def test_list_products_fast_serialization(self):
+        self.create_products(3)
+        expected = self.client.get('/product/?page_size=2').data
+        product_cache.cache.clear()
+        with override_settings(PRODUCT_FAST_LIST_SERIALIZATION=True):
+            response = self.client.get('/product/?page_size=2')
+        self.assertEqual(json.loads(response.content),
+                         json.loads(JSONRenderer().render(expected)))
+
+    def test_list_products_sparse_fields(self):
+        self.create_products(2)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/product/?fields=id,name,price,stock&page_size=2')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'price', 'stock'})
+        self.assertNotIn('"description"', queries[-1]['sql'])
+        self.assertEqual(len(self.collect_pages(response.data['next'])), 1)
+
+    @override_settings(PRODUCT_FAST_LIST_SERIALIZATION=True)
+    def test_list_products_sparse_fields_fast_serialization(self):
+        response = self.client.get('/product/?fields=name,image')
+        self.assertEqual(response.data['results'][0],
+                         {'name': self.product.name,
+                          'image': f'http://testserver/media/{self.product.image.name}'})
+
+    def test_retrieve_product_sparse_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/product/{self.product.id}/?fields=id,stock')
+        self.assertEqual(response.data, {'id': str(self.product.id), 'stock': self.product.stock})
+        self.assertNotIn('"description"', queries[-1]['sql'])
+
+    def test_unknown_sparse_fields(self):
+        response = self.client.get('/product/?fields=name,password')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(f'/product/{self.product.id}/?fields=name,password')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_products_ndjson(self):
+        products = [self.product] + self.create_products(4)
+        response = self.client.get('/product/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        exported = [json.loads(line) for line in lines]
+        self.assertEqual([item['id'] for item in exported], [str(product.id) for product in products])
+        self.assertEqual(exported[0]['price'], '10.00')
+
+    def test_export_products_csv(self):
+        self.create_products(2)
+        response = self.client.get('/product/export/?file_format=csv&ordering=-created_at')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,user,name,description,price,stock,image')
+        self.assertEqual([line.split(',')[2] for line in lines[1:]],
+                         ['Product 1', 'Product 0', self.product.name])
+
+    async def test_async_list_products(self):
+        await sync_to_async(self.create_products)(4)
+        url = '?page_size=2&ordering=-price&fields=id,name,price'
+        expected = await sync_to_async(self.collect_pages)(f'/product/{url}')
+
+        ids = []
+        next_url = f'/async/product/{url}'
+        while next_url:
+            response = await self.async_client.get(next_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertEqual(set(data['results'][0]), {'id', 'name', 'price'})
+            ids.extend(item['id'] for item in data['results'])
+            next_url = data['next']
+        self.assertEqual(ids, expected)
+
+        response = await self.async_client.get('/async/product/?min_price=cheap')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_async_retrieve_product(self):
+        url = f'{self.product.id}/'
+        expected = await sync_to_async(self.client.get)(f'/product/{url}')
+        response = await self.async_client.get(f'/async/product/{url}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), expected.json())
+
+        response = await self.async_client.get(f'/async/product/{url}',
+                                               headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = await self.async_client.get('/async/product/not-a-uuid/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_search_products(self):
+        described = Product.objects.create(**{**self.product_data, "name": "Cable",
+                                              "description": "Fits any wireless keyboard"})
+        named = Product.objects.create(**{**self.product_data, "name": "Wireless keyboard",
+                                          "description": "Compact layout"})
+        Product.objects.create(**{**self.product_data, "name": "Wireless keyboard", "is_active": False})
+
+        response = self.client.get('/product/search/?q=wireless keyboard')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['results']],
+                         [str(named.id), str(described.id)])
+
+    def test_search_sees_updates(self):
+        self.client.patch(f'/product/{self.product.id}/', data={"name": "Mechanical keyboard"},
+                          content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        response = self.client.get('/product/search/?q=keyboard&fields=id')
+        self.assertEqual(response.data['results'], [{'id': str(self.product.id)}])
+
+    def test_search_finds_product_after_non_text_save(self):
+        self.product.name = "Mechanical keyboard"
+        self.product.save()
+        product = Product.objects.create(**{**self.product_data, "name": "Wireless keyboard"})
+        product.stock = 5
+        product.save()
+        response = self.client.get('/product/search/?q=keyboard&fields=id')
+        self.assertCountEqual([item['id'] for item in response.data['results']],
+                              [str(self.product.id), str(product.id)])
+
+    @skipIf(connection.vendor != 'postgresql', 'The search vector trigger is PostgreSQL only.')
+    def test_search_vector_is_only_rebuilt_when_the_text_changes(self):
+        Product.objects.filter(pk=self.product.pk).update(search_vector=None)
+        self.product.stock = 5
+        self.product.save()
+        self.assertTrue(Product.objects.filter(pk=self.product.pk, search_vector=None).exists())
+
+        self.product.name = "Mechanical keyboard"
+        self.product.save()
+        self.assertFalse(Product.objects.filter(pk=self.product.pk, search_vector=None).exists())
+
+    def test_search_requires_query(self):
+        response = self.client.get('/product/search/?q=')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,60 @@
+import tracemalloc
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import Client, TransactionTestCase, override_settings
+
+from rest_framework import status
+
+from apps.products.models.product import Product
+from apps.users.models.user import User
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Server-side cursors are PostgreSQL specific.')
+@override_settings(PRODUCT_EXPORT={'CHUNK_SIZE': 1000})
+class ProductExportMemoryTest(TransactionTestCase):
+    """
+    Check that exporting the catalog keeps memory flat on a large table.
+    """
+    product_count = 200_000
+    max_peak = 8 * 1024 * 1024
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='export@example.com', password='password',
+            first_name='Export', last_name='User',
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'''
+                INSERT INTO {Product._meta.db_table}
+                    (id, created_at, updated_at, is_active, is_staff, name,
+                     description, price, stock, image, image_derivatives, user_id)
+                SELECT gen_random_uuid(), now() - n * interval '1 second', now(),
+                       true, false, 'Product ' || n,
+                       'A product description long enough to matter ' || n,
+                       n %% 1000, n %% 50, 'product_image/' || n || '.jpg', '{{}}', %s
+                FROM generate_series(1, %s) AS n
+            ''', [self.user.pk, self.product_count])
+
+    def test_export_memory_is_bounded(self):
+        for file_format in ('ndjson', 'csv'):
+            with self.subTest(file_format):
+                response = Client().get(f'/product/export/?file_format={file_format}')
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+                tracemalloc.start()
+                try:
+                    lines = size = 0
+                    for chunk in response.streaming_content:
+                        lines += chunk.count(b'\n')
+                        size += len(chunk)
+                    _, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+
+                header = 1 if file_format == 'csv' else 0
+                self.assertEqual(lines, self.product_count + header)
+                # The body is tens of megabytes; the export never holds more
+                # than a chunk of it.
+                self.assertGreater(size, 4 * self.max_peak)
+                self.assertLess(peak, self.max_peak)
@@ -0,0 +1,96 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import RequestFactory, TransactionTestCase
+
+from rest_framework.request import Request
+
+from apps.default.pagination.keyset_pagination import _keyset_condition
+from apps.products.filters.product_filter import ProductFilterBackend
+from apps.products.models.product import Product
+from apps.users.models.user import User
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are PostgreSQL specific.')
+class ProductIndexTest(TransactionTestCase):
+    """
+    Check the plans of the hot product queries on a realistically sized table.
+    """
+    product_count = 1_000_000
+    user_count = 1_000
+
+    def setUp(self):
+        """
+        Seed the tables server side so the planner sees real statistics and
+        would fall back to a sequential scan if a matching index were missing.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f'''
+                INSERT INTO {User._meta.db_table}
+                    (id, password, is_superuser, is_staff, is_active, date_joined,
+                     created_at, updated_at, first_name, last_name, email)
+                SELECT gen_random_uuid(), '', false, false, true, now(),
+                       now(), now(), 'Seed', 'User', 'seed' || n || '@example.com'
+                FROM generate_series(1, %s) AS n
+            ''', [self.user_count])
+            cursor.execute(f'''
+                INSERT INTO {Product._meta.db_table}
+                    (id, created_at, updated_at, is_active, is_staff, name,
+                     description, price, stock, image, image_derivatives, user_id)
+                SELECT gen_random_uuid(),
+                       now() - n * interval '1 second',
+                       now(), n %% 10 <> 0, false, 'Product ' || n,
+                       'Description', n %% 1000, n %% 50, '', '{{}}', users.id
+                FROM generate_series(1, %s) AS n
+                JOIN (
+                    SELECT id, row_number() OVER () - 1 AS position
+                    FROM {User._meta.db_table}
+                ) AS users ON users.position = n %% %s
+            ''', [self.product_count, self.user_count])
+            cursor.execute(f'ANALYZE {User._meta.db_table}')
+            cursor.execute(f'ANALYZE {Product._meta.db_table}')
+        self.queryset = Product.objects.filter(is_active=True)
+        self.product = self.queryset.order_by('created_at', 'id')[500_000]
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn('Seq Scan', plan)
+
+    def test_hot_queries_use_indexes(self):
+        ordered = self.queryset.order_by('created_at', 'id')
+        position = (self.product.created_at, self.product.id)
+        condition = _keyset_condition(('created_at', 'id'), position, reverse=False)
+
+        with self.subTest('list first page'):
+            self.assertUsesIndex(ordered[:51], 'product_active_created_idx')
+        with self.subTest('list cursor page'):
+            self.assertUsesIndex(ordered.filter(condition)[:51], 'product_active_created_idx')
+        with self.subTest('retrieve'):
+            self.assertUsesIndex(self.queryset.filter(pk=self.product.pk),
+                                 f'{Product._meta.db_table}_pkey')
+        with self.subTest('owner products'):
+            self.assertUsesIndex(self.queryset.filter(user_id=self.product.user_id),
+                                 'product_user_active_idx')
+
+    def filtered(self, query):
+        """
+        Filter and order the active products like the list endpoint does.
+        """
+        request = Request(RequestFactory().get('/product/', query))
+        backend = ProductFilterBackend()
+        queryset = backend.filter_queryset(request, self.queryset, view=None)
+        return queryset.order_by(*backend.get_ordering(request, queryset, view=None))[:51]
+
+    def test_filtered_queries_use_indexes(self):
+        cases = [
+            ({'ordering': 'price', 'min_price': 100, 'max_price': 110},
+             'product_active_price_idx'),
+            ({'ordering': '-stock', 'max_stock': 5}, 'product_active_stock_idx'),
+            ({'in_stock': 'true'}, 'product_in_stock_created_idx'),
+            ({'in_stock': 'true', 'ordering': 'price', 'max_price': 10},
+             'product_in_stock_price_idx'),
+        ]
+        for query, index_name in cases:
+            with self.subTest(query=query):
+                self.assertUsesIndex(self.filtered(query), index_name)
@@ -4,12 +4,22 @@ from django.urls import include, path
 
 from rest_framework import routers
 
+from apps.products.views.product_async_view import (
+    ProductDetailAsyncView,
+    ProductListAsyncView,
+)
 from apps.products.views.product_view import ProductViewSet
+from apps.products.views.purchase_view import PurchaseViewSet
+from apps.products.views.reservation_view import ReservationViewSet
 
 router = routers.DefaultRouter()
 
 router.register(r'product', ProductViewSet, basename='product')
+router.register(r'purchase', PurchaseViewSet, basename='purchase')
+router.register(r'reservation', ReservationViewSet, basename='reservation')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('async/product/', ProductListAsyncView.as_view(), name='product-async-list'),
+    path('async/product/<str:pk>/', ProductDetailAsyncView.as_view(), name='product-async-detail'),
 ]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,93 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+
+from rest_framework.exceptions import NotFound
+
+from apps.default.pagination.keyset_pagination import KeysetPagination
+from apps.default.views.async_api_view import AsyncAPIView
+from apps.default.views.conditional_view import ConditionalGetMixin
+from apps.default.views.sparse_fieldset_view import SparseFieldsetMixin
+from apps.products.filters.product_filter import ProductFilterBackend
+from apps.products.models.product import Product
+from apps.products.serializers.product_serializer import (
+    ProductSerializer,
+    ProductValuesSerializer,
+)
+
+
+class ProductAsyncViewMixin(ConditionalGetMixin, SparseFieldsetMixin):
+    """
+    Shared setup of the async product read views, which answer like the
+    `list` and `retrieve` actions of `ProductViewSet`.
+
+    Rows are fetched with `.values()` and rendered by
+    `ProductValuesSerializer`, which needs no further queries.
+    """
+    queryset = Product.objects.filter(is_active=True)
+
+    def get_serializer_class(self):
+        return ProductSerializer
+
+    def get_serializer_context(self):
+        return {'request': self.request, 'view': self}
+
+
+class ProductListAsyncView(ProductAsyncViewMixin, AsyncAPIView):
+    """
+    Async product list: same query params, pages and validators as
+    `GET /product/`.
+    """
+    action = 'list'
+    filter_backends = [ProductFilterBackend]
+    pagination_class = KeysetPagination
+
+    async def get(self, request):
+        fields = self.get_requested_fields()
+        queryset = self.queryset.all()
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(self.request, queryset, self)
+
+        paginator = self.pagination_class()
+        ordering = [field.lstrip('-') for field in
+                    paginator.get_ordering(self.request, queryset, self)]
+        page = await paginator.apaginate_queryset(
+            ProductValuesSerializer.values(queryset, fields, required=[*ordering, 'updated_at']),
+            self.request, self)
+        last_modified, fingerprint = self.get_page_validators(page, paginator)
+        return await self.aconditional_response(
+            self.request, last_modified, fingerprint,
+            lambda: self.render_page(page, paginator, fields))
+
+    async def render_page(self, page, paginator, fields):
+        serializer = ProductValuesSerializer(
+            page, context=self.get_serializer_context(), fields=fields)
+        return self.render(paginator.get_paginated_response(serializer.data).data)
+
+
+class ProductDetailAsyncView(ProductAsyncViewMixin, AsyncAPIView):
+    """
+    Async product retrieve: same query params and validators as
+    `GET /product/<pk>/`.
+    """
+    action = 'retrieve'
+
+    async def get(self, request, pk):
+        fields = self.get_requested_fields()
+        try:
+            product_id = Product._meta.pk.to_python(pk)
+        except DjangoValidationError:
+            raise NotFound(detail="Product not found.")
+
+        queryset = ProductValuesSerializer.values(
+            self.queryset.filter(pk=product_id), fields, required=('updated_at',))
+        try:
+            row = await queryset.aget()
+        except Product.DoesNotExist:
+            raise NotFound(detail="Product not found.")
+
+        async def render():
+            serializer = ProductValuesSerializer(
+                [row], context=self.get_serializer_context(), fields=fields)
+            return self.render(serializer.data[0])
+
+        return await self.aconditional_response(
+            self.request, row['updated_at'], product_id, render)
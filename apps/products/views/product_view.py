@@ -1,58 +1,153 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.http import StreamingHttpResponse
+
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from apps.default.pagination.keyset_pagination import KeysetPagination
+from apps.default.views.conditional_view import ConditionalGetMixin
+from apps.default.views.idempotent_view import IdempotentMixin
+from apps.default.views.sparse_fieldset_view import SparseFieldsetMixin
+from apps.products.cache.product_cache import product_cache
+from apps.products.exporters.product_exporter import ProductExporter
+from apps.products.filters.product_filter import ProductFilterBackend
+from apps.products.images.image_pipeline import image_pipeline
+from apps.products.importers.product_importer import ProductImporter
 from apps.products.models.product import Product
-from apps.products.serializers.product_serializer import ProductSerializer
+from apps.products.models.purchase import Purchase
+from apps.products.models.reservation import Reservation
+from apps.products.serializers.checkout_serializer import CheckoutSerializer
+from apps.products.serializers.purchase_serializer import PurchaseSerializer
+from apps.products.serializers.reservation_serializer import (
+    ReservationSerializer,
+    ReserveSerializer,
+)
+from apps.products.serializers.product_serializer import (
+    ProductSerializer,
+    ProductValuesSerializer,
+)
 
 
-class ProductViewSet(GenericViewSet):
+class ProductViewSet(ConditionalGetMixin, IdempotentMixin, SparseFieldsetMixin, GenericViewSet):
     """
     API endpoint that allows products to be viewed or edited.
     """
     queryset = Product.objects.filter(is_active=True)
+    pagination_class = KeysetPagination
+    filter_backends = [ProductFilterBackend]
+    sparse_fieldset_actions = ('list', 'retrieve', 'search')
+    sparse_field_columns = {'image_derivatives': ('image', 'image_derivatives')}
 
     def get_permissions(self):
-        if self.action in ['create', 'partial_update', 'destroy', 'buy']:
+        if self.action in ['create', 'create_product', 'partial_update', 'destroy', 'buy',
+                           'checkout', 'import_products', 'reserve']:
             return [IsAuthenticated()]
         return [AllowAny()]
 
     def get_serializer_class(self):
+        if self.action == 'checkout':
+            return CheckoutSerializer
+        if self.action == 'reserve':
+            return ReserveSerializer
         return ProductSerializer
 
     def list(self, request):
         """
-        List all products.
+        List products, one page at a time.
+
+        Products are ordered by creation date unless `ordering` says
+        otherwise, and can be narrowed down by price and stock. Follow the
+        `next` and `previous` links to move between pages; they keep the
+        filters and the ordering of the first page.
+
+        Responses carry `ETag` and `Last-Modified` headers; send them back in
+        `If-None-Match`/`If-Modified-Since` to get a 304 while nothing changed.
 
         ---
+        Query params:
+            cursor: Opaque cursor taken from a `next`/`previous` link.
+            page_size: Number of products per page, capped by the server.
+            fields: Comma separated fields to return, e.g. `id,name,price,stock`.
+            min_price, max_price: Inclusive price range.
+            min_stock, max_stock: Inclusive stock range.
+            in_stock: `true` for products with stock left, `false` for sold out ones.
+            ordering: One of `created_at`, `price`, `stock`, prefixed with `-`
+                for descending order. Defaults to `created_at`.
+
         response:
-            200 OK: Serialized data of all products.
+            200 OK: A page of serialized products.
             Example JSON:
-                [
-                    {
-                        "id": "str",
-                        "name": "str",
-                        "description": "str",
-                        "price": "float",
-                        "stock": "int",
-                        "image": "url",
-                        "user": "user_id"
-                    },
-                    ...
-                ]
+                {
+                    "next": "url",
+                    "previous": "url",
+                    "results": [
+                        {
+                            "id": "str",
+                            "name": "str",
+                            "description": "str",
+                            "price": "float",
+                            "stock": "int",
+                            "image": "url",
+                            "image_derivatives": {"thumbnail": {"webp": "url", "jpeg": "url"}, ...},
+                            "user": "user_id"
+                        },
+                        ...
+                    ]
+                }
+            304 Not Modified: The client copy of the page is current.
+            400 Bad Request: Unknown fields requested, or invalid filter or ordering.
+            404 Not Found: Invalid cursor.
         """
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        self.get_requested_fields()
+        page = self.get_list_page()
+        last_modified, fingerprint = self.get_page_validators(page, self.paginator)
+        return self.conditional_response(
+            request, last_modified, fingerprint,
+            lambda: Response(self.get_list_data(page), status=status.HTTP_200_OK)
+        )
+
+    def get_list_page(self):
+        """
+        Fetch the rows of the requested page with the columns of the
+        requested fields, the ordering ones and `updated_at`.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        fields = self.get_requested_fields()
+        ordering = [field.lstrip('-') for field in
+                    self.paginator.get_ordering(self.request, queryset, self)]
+        required = [*ordering, 'updated_at']
+
+        if settings.PRODUCT_FAST_LIST_SERIALIZATION:
+            return self.paginate_queryset(
+                ProductValuesSerializer.values(queryset, fields, required=required))
+        return self.paginate_queryset(self.get_sparse_queryset(queryset, required=required))
+
+    def get_list_data(self, page):
+        return product_cache.get_or_set(
+            product_cache.list_namespace, self.request, lambda: self.get_page_data(page))
+
+    def get_page_data(self, page):
+        if settings.PRODUCT_FAST_LIST_SERIALIZATION:
+            serializer = ProductValuesSerializer(
+                page, context=self.get_serializer_context(), fields=self.get_requested_fields())
+        else:
+            serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data).data
 
     def retrieve(self, request, pk=None):
         """
         Retrieve a specific product by its ID.
 
         ---
+        Query params:
+            fields: Comma separated fields to return, e.g. `id,name,price,stock`.
+
         response:
             200 OK: Serialized data of a specific product.
             Example JSON:
@@ -63,18 +158,122 @@ class ProductViewSet(GenericViewSet):
                     "price": "float",
                     "stock": "int",
                     "image": "url",
+                    "image_derivatives": {"thumbnail": {"webp": "url", "jpeg": "url"}, ...},
                     "user": "user_id"
                 }
+            304 Not Modified: The client copy of the product is current.
+            400 Bad Request: Unknown fields requested.
+            404 Not Found: Product not found.
         """
-        product = self.get_object_or_404(pk=pk)
-        serializer = self.get_serializer(product)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        self.get_requested_fields()
+        product_id = self.get_product_id(pk)
+        last_modified = self.get_queryset().filter(pk=product_id).values_list(
+            'updated_at', flat=True).first()
+        if last_modified is None:
+            raise NotFound(detail="Product not found.")
+
+        return self.conditional_response(
+            request, last_modified, product_id,
+            lambda: Response(self.get_detail_data(product_id), status=status.HTTP_200_OK)
+        )
+
+    def get_detail_data(self, product_id):
+        return product_cache.get_or_set(
+            str(product_id), self.request,
+            lambda: self.get_serializer(self.get_object_or_404(
+                pk=product_id, queryset=self.get_sparse_queryset(self.get_queryset()))).data
+        )
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Search products by name and description.
+
+        Returns the best matching products first, name matches ranking above
+        description matches. The query supports quoted phrases, `or` and
+        `-word` exclusions.
+
+        ---
+        Query params:
+            q: Text to search for.
+            page_size: Maximum number of results, capped by the server.
+            fields: Comma separated fields to return, e.g. `id,name,price,stock`.
+
+        response:
+            200 OK: The best matching products.
+            Example JSON:
+                {
+                    "results": [
+                        {
+                            "id": "str",
+                            "name": "str",
+                            "description": "str",
+                            "price": "float",
+                            "stock": "int",
+                            "image": "url",
+                            "image_derivatives": {"thumbnail": {"webp": "url", "jpeg": "url"}, ...},
+                            "user": "user_id"
+                        },
+                        ...
+                    ]
+                }
+            400 Bad Request: Missing search text or unknown fields requested.
+        """
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({"q": ["This query parameter is required."]})
+
+        page_size = self.paginator.get_page_size(request)
+        queryset = self.get_sparse_queryset(Product.objects.search(text))[:page_size]
+        serializer = self.get_serializer(queryset, many=True)
+        return Response({"results": serializer.data}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Export the whole catalog as NDJSON or CSV.
+
+        The response is streamed while products are read from the database
+        in chunks, so catalogs of any size can be exported. Products are
+        ordered like the list and accept the same filters.
+
+        ---
+        Query params:
+            file_format: `ndjson` (default) or `csv`.
+            min_price, max_price, min_stock, max_stock, in_stock, ordering:
+                As for the list.
+
+        response:
+            200 OK: The products, one per line.
+            Example NDJSON line:
+                {"id": "str", "user": "user_id", "name": "str", "description": "str",
+                 "price": "float", "stock": "int", "image": "url", "image_derivatives": {...}}
+            CSV columns:
+                id,user,name,description,price,stock,image
+            400 Bad Request: Unknown format, or invalid filter or ordering.
+        """
+        file_format = request.query_params.get('file_format', 'ndjson')
+        if file_format not in ProductExporter.formats:
+            raise ValidationError({"file_format": ["Use one of: %s." % ', '.join(ProductExporter.formats)]})
+
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.order_by(*self.paginator.get_ordering(request, queryset, self))
+        exporter = ProductExporter(queryset, context=self.get_serializer_context())
+
+        response = StreamingHttpResponse(exporter.render(file_format),
+                                         content_type=ProductExporter.formats[file_format])
+        response['Content-Disposition'] = 'attachment; filename="products.%s"' % file_format
+        return response
 
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def create_product(self, request):
         """
         Creates a new product instance.
 
+        Send an `Idempotency-Key` header to make retries safe: a repeated key
+        returns the first response (with `Idempotent-Replayed: true`)
+        instead of creating another product.
+
         ---
         Body:
             {
@@ -95,18 +294,83 @@ class ProductViewSet(GenericViewSet):
                     "price": "float",
                     "stock": "int",
                     "image": "url",
+                    "image_derivatives": {"thumbnail": {"webp": "url", "jpeg": "url"}, ...},
                     "user": "user_id"
                 }
+            409 Conflict: The first request with this Idempotency-Key is still running.
+            422 Unprocessable Entity: The Idempotency-Key was used with another body.
         """
+        return self.idempotent_response(request, lambda: self.perform_create_product(request))
+
+    def perform_create_product(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(user=request.user)
+        product = serializer.save(user=request.user)
+        self.invalidate_cache()
+        if 'image' in serializer.validated_data:
+            self.schedule_image_derivatives(product)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def import_products(self, request):
+        """
+        Creates many products at once from a CSV or JSON Lines file.
+
+        The file is read as a stream and every row is validated like a
+        `create_product` body (without image). Valid rows are created for the
+        authenticated user in batches, in a single transaction; invalid rows
+        are skipped and reported. Rows are numbered from 1, CSV header aside.
+
+        ---
+        Query params:
+            batch_size: Number of rows inserted per query, capped by the server.
+
+        Body (multipart form data):
+            file: The CSV (with a `name,description,price,stock` header) or
+                JSON Lines (`.jsonl`/`.ndjson`, one object per line) file.
+            file_format: `csv` or `jsonl`; guessed from the file name if omitted.
+
+        responses:
+            200 OK: Import finished.
+            Example JSON:
+                {
+                    "created": <int>,
+                    "failed": <int>,
+                    "errors": [
+                        {
+                            "row": <int>,
+                            "errors": {"price": ["A valid number is required."]}
+                        },
+                        ...
+                    ]
+                }
+            400 Bad Request: Missing or unreadable file, or unknown format.
+        """
+        file = request.FILES.get('file')
+        if file is None:
+            raise ValidationError({"file": ["No file was submitted."]})
+
+        file_format = request.data.get('file_format') or ProductImporter.get_format(file.name)
+        if file_format not in ProductImporter.formats:
+            raise ValidationError({"file_format": ["Use one of: %s." % ', '.join(ProductImporter.formats)]})
+
+        try:
+            batch_size = int(request.query_params.get('batch_size', 0))
+        except ValueError:
+            raise ValidationError({"batch_size": ["A valid integer is required."]})
+        batch_size = max(0, min(batch_size, settings.PRODUCT_IMPORT['MAX_BATCH_SIZE']))
+
+        report = ProductImporter(request.user, batch_size=batch_size).run(file, file_format)
+        if report['created']:
+            self.invalidate_cache()
+        return Response(report, status=status.HTTP_200_OK)
+
     def partial_update(self, request, pk=None):
         """
         Updates a specific product by its ID.
 
+        A new stock for a sharded product is split again across its shards.
+
         ---
         Body:
             {
@@ -127,6 +391,9 @@ class ProductViewSet(GenericViewSet):
         serializer = self.get_serializer(product, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        self.invalidate_cache(product.pk)
+        if 'image' in serializer.validated_data:
+            self.schedule_image_derivatives(product)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def destroy(self, request, pk=None):
@@ -146,7 +413,9 @@ class ProductViewSet(GenericViewSet):
             return Response({"detail": "You do not have permission to delete this product."},
                 status=status.HTTP_403_FORBIDDEN
             )
+        product_id = product.pk
         product.delete()
+        self.invalidate_cache(product_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
@@ -155,6 +424,17 @@ class ProductViewSet(GenericViewSet):
         Buys a specific product by decreasing its stock by 1.
 
         Any authenticated user can perform this action. The stock must be greater than 0.
+        The stock is checked and decremented atomically, so concurrent buyers
+        can never take more units than are left.
+
+        Products with queued purchases answer right away with a pending
+        purchase instead; the stock is taken later by `apply_purchases`,
+        which rejects the purchase if no unit is left by then. Follow it
+        with `GET /purchase/<id>/`.
+
+        Send an `Idempotency-Key` header to make retries safe: a repeated key
+        returns the first response (with `Idempotent-Replayed: true`)
+        instead of buying again.
 
         ---
         Body:
@@ -167,26 +447,196 @@ class ProductViewSet(GenericViewSet):
                     "status": "Product purchased",
                     "remaining_stock": <int>
                 }
+            202 Accepted: Purchase queued.
+            Example JSON:
+                {
+                    "status": "Purchase pending",
+                    "purchase": {
+                        "id": "str",
+                        "product": "product_id",
+                        "quantity": 1,
+                        "status": "pending"
+                    }
+                }
             400 Bad Request: Product is out of stock.
             404 Not Found: Product not found.
+            409 Conflict: The first request with this Idempotency-Key is still running.
+            422 Unprocessable Entity: The Idempotency-Key was used with another body.
         """
-        product = self.get_object_or_404(pk=pk)
-        if product.stock > 0:
-            product.stock -= 1
-            product.save()
-            return Response({"status": "Product purchased", "remaining_stock": product.stock},
-                status=status.HTTP_200_OK
+        product_id = self.get_product_id(pk)
+        return self.idempotent_response(request, lambda: self.perform_buy(request, product_id))
+
+    def perform_buy(self, request, product_id):
+        # The decrement of a plain product also reports how other products
+        # are served, so each outcome only runs the statements of its path.
+        outcome, remaining_stock = Product.objects.take_stock(product_id, skip_queued=True)
+        if outcome == 'queued':
+            purchase = Purchase.objects.enqueue(product_id, request.user)
+            if purchase is not None:
+                return Response({"status": "Purchase pending",
+                                 "purchase": PurchaseSerializer(purchase).data},
+                    status=status.HTTP_202_ACCEPTED
+                )
+        if outcome in ('sharded', 'queued'):
+            # Sharded products take their units from a shard, and products
+            # whose queue was switched off in between from their stock.
+            remaining_stock = Product.objects.decrement_stock(product_id)
+            outcome = 'out_of_stock' if remaining_stock is None else 'purchased'
+
+        if outcome == 'not_found':
+            raise NotFound(detail="Product not found.")
+        if outcome == 'out_of_stock':
+            return Response({"detail": "Product is out of stock."},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        else:
+
+        self.invalidate_cache(product_id)
+        return Response({"status": "Product purchased", "remaining_stock": remaining_stock},
+            status=status.HTTP_200_OK
+        )
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def reserve(self, request, pk=None):
+        """
+        Holds units of a specific product for the authenticated user.
+
+        The units leave the stock right away and are held until the
+        reservation expires. Confirm the reservation with
+        `POST /reservation/<id>/confirm/` to complete the purchase; expired
+        reservations give their units back to the stock.
+
+        ---
+        Body:
+            {
+                "quantity": "int"  // Defaults to 1.
+            }
+
+        responses:
+            201 Created: Units reserved.
+            Example JSON:
+                {
+                    "reservation": {
+                        "id": "str",
+                        "product": "product_id",
+                        "quantity": <int>,
+                        "status": "pending",
+                        "expires_at": "datetime"
+                    },
+                    "remaining_stock": <int>
+                }
+            400 Bad Request: Invalid quantity, or not enough stock.
+            404 Not Found: Product not found.
+        """
+        product_id = self.get_product_id(pk)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        reservation, remaining_stock = Reservation.objects.reserve(
+            product_id, request.user, serializer.validated_data['quantity'],
+            ttl=settings.PRODUCT_RESERVATION['TTL'],
+        )
+        if reservation is None:
+            self.get_object_or_404(pk=product_id)
             return Response({"detail": "Product is out of stock."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-    def get_object_or_404(self, pk):
+        self.invalidate_cache(product_id)
+        return Response({"reservation": ReservationSerializer(reservation).data,
+                         "remaining_stock": remaining_stock},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def checkout(self, request):
+        """
+        Buys several products at once.
+
+        Any authenticated user can perform this action. Either every item is
+        purchased, or none is and the response tells which items failed.
+
+        ---
+        Body:
+            {
+                "items": [
+                    {
+                        "product": "product_id",
+                        "quantity": "int"
+                    },
+                    ...
+                ]
+            }
+
+        responses:
+            200 OK: Every item was purchased.
+            Example JSON:
+                {
+                    "status": "Checkout completed",
+                    "items": [
+                        {
+                            "product": "product_id",
+                            "quantity": <int>,
+                            "status": "purchased",
+                            "remaining_stock": <int>
+                        },
+                        ...
+                    ]
+                }
+            400 Bad Request: Invalid cart, or some item could not be purchased
+                (status "out_of_stock" with "available_stock", or "not_found").
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['items']
+
+        quantities = {item['product']: item['quantity'] for item in items}
+        completed, results = Product.objects.checkout(quantities)
+        items = [
+            {"product": item['product'], "quantity": item['quantity'], **results[item['product']]}
+            for item in items
+        ]
+
+        if not completed:
+            return Response({"detail": "Checkout failed.", "items": items},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        for product_id in quantities:
+            self.invalidate_cache(product_id)
+        return Response({"status": "Checkout completed", "items": items},
+            status=status.HTTP_200_OK
+        )
+
+    def invalidate_cache(self, pk=None):
+        """
+        Drop the cached payloads affected by a write once it is committed.
+        """
+        transaction.on_commit(lambda: product_cache.invalidate(pk))
+
+    def schedule_image_derivatives(self, product):
+        """
+        Generate the resized copies of the product image once the write is
+        committed, in the background.
+        """
+        transaction.on_commit(lambda: image_pipeline.enqueue(product))
+
+    def get_product_id(self, pk):
+        """
+        Normalize a product id taken from the URL, so every spelling of the
+        same UUID shares one cache entry.
+        """
+        try:
+            return Product._meta.pk.to_python(pk)
+        except DjangoValidationError:
+            raise NotFound(detail="Product not found.")
+
+    def get_object_or_404(self, pk, queryset=None):
         """
         Helper method to get the object with the provided pk or raise a 404 error if it doesn't exist.
         """
+        if queryset is None:
+            queryset = self.queryset
         try:
-            return self.queryset.get(pk=pk)
+            return queryset.get(pk=pk)
         except Product.DoesNotExist:
             raise NotFound(detail="Product not found.")
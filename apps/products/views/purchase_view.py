@@ -0,0 +1,43 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
+
+from apps.products.models.purchase import Purchase
+from apps.products.serializers.purchase_serializer import PurchaseSerializer
+
+
+class PurchaseViewSet(GenericViewSet):
+    """
+    API endpoint that allows users to follow their queued purchases.
+    """
+    serializer_class = PurchaseSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Purchase.objects.filter(user=self.request.user)
+
+    def retrieve(self, request, pk=None):
+        """
+        Retrieve a queued purchase of the authenticated user by its ID.
+
+        ---
+        response:
+            200 OK: Serialized purchase.
+            Example JSON:
+                {
+                    "id": "str",
+                    "product": "product_id",
+                    "quantity": <int>,
+                    "status": "pending" | "applied" | "rejected"
+                }
+            404 Not Found: Purchase not found.
+        """
+        try:
+            purchase = self.get_queryset().get(pk=pk)
+        except (Purchase.DoesNotExist, ValueError, DjangoValidationError):
+            raise NotFound(detail="Purchase not found.")
+        return Response(self.get_serializer(purchase).data, status=status.HTTP_200_OK)
@@ -0,0 +1,77 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
+
+from apps.products.models.reservation import Reservation
+from apps.products.serializers.reservation_serializer import ReservationSerializer
+
+
+class ReservationViewSet(GenericViewSet):
+    """
+    API endpoint that allows users to follow and confirm their stock reservations.
+    """
+    serializer_class = ReservationSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Reservation.objects.filter(user=self.request.user)
+
+    def retrieve(self, request, pk=None):
+        """
+        Retrieve a reservation of the authenticated user by its ID.
+
+        ---
+        response:
+            200 OK: Serialized reservation.
+            Example JSON:
+                {
+                    "id": "str",
+                    "product": "product_id",
+                    "quantity": <int>,
+                    "status": "pending" | "confirmed" | "expired",
+                    "expires_at": "datetime"
+                }
+            404 Not Found: Reservation not found.
+        """
+        serializer = self.get_serializer(self.get_reservation(pk))
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'])
+    def confirm(self, request, pk=None):
+        """
+        Completes the purchase of a pending reservation before it expires.
+
+        ---
+        Body:
+            No body required for this action.
+
+        responses:
+            200 OK: Reservation confirmed.
+            Example JSON:
+                {
+                    "status": "Reservation confirmed"
+                }
+            400 Bad Request: The reservation expired or was already confirmed.
+            404 Not Found: Reservation not found.
+        """
+        reservation_id = self.get_reservation(pk).pk
+        if Reservation.objects.confirm(reservation_id, request.user):
+            return Response({"status": "Reservation confirmed"}, status=status.HTTP_200_OK)
+
+        reservation = self.get_reservation(reservation_id)
+        if reservation.status == Reservation.Status.CONFIRMED:
+            detail = "Reservation already confirmed."
+        else:
+            detail = "Reservation expired."
+        return Response({"detail": detail}, status=status.HTTP_400_BAD_REQUEST)
+
+    def get_reservation(self, pk):
+        try:
+            return self.get_queryset().get(pk=pk)
+        except (Reservation.DoesNotExist, ValueError, DjangoValidationError):
+            raise NotFound(detail="Reservation not found.")
@@ -0,0 +1,35 @@
+from django.core.cache import caches
+
+
+class UserCache:
+    """
+    Short-lived cache of the users resolved from access tokens, keyed by
+    user id, so authenticated requests skip the user query.
+
+    `User.save` and `User.delete` drop the entry of the user once the
+    transaction commits, which covers updates, deletions and deactivations
+    made through the ORM. The cache TIMEOUT bounds how long other processes
+    (and bulk `QuerySet.update` calls) may leave a stale user behind.
+    """
+
+    def __init__(self, alias='users'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, pk):
+        return 'users:%s' % pk
+
+    def get(self, pk):
+        return self.cache.get(self.make_key(pk))
+
+    def set(self, pk, user):
+        self.cache.set(self.make_key(pk), user)
+
+    def invalidate(self, pk):
+        self.cache.delete(self.make_key(pk))
+
+
+user_cache = UserCache()
@@ -0,0 +1,24 @@
+from rest_framework.filters import BaseFilterBackend
+
+from apps.users.serializers.user_filter_serializer import UserFilterSerializer
+
+
+class UserFilterBackend(BaseFilterBackend):
+    """
+    Filter users on the beginning of their email address.
+
+    The prefix is matched case sensitively with a `LIKE 'prefix%'`, which
+    the `user_email_prefix_idx` pattern index turns into an index range
+    scan (see the User model).
+    """
+
+    def get_params(self, request):
+        serializer = UserFilterSerializer(data=request.query_params.dict())
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def filter_queryset(self, request, queryset, view):
+        params = self.get_params(request)
+        if 'email_prefix' in params:
+            queryset = queryset.filter(email__startswith=params['email_prefix'])
+        return queryset
@@ -0,0 +1,206 @@
+import atexit
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many password checks in progress, try again later."
+    default_code = 'password_hashing_busy'
+
+
+def configure_worker(settings_module, niceness):
+    # The hashers only need the settings, not the app registry.
+    os.environ['DJANGO_SETTINGS_MODULE'] = settings_module
+    # Lower the priority of hashing, so requests sharing the CPUs go first.
+    os.nice(niceness)
+
+
+def timed_make_password(password):
+    started = time.perf_counter()
+    return hashers.make_password(password), time.perf_counter() - started
+
+
+def timed_check_password(password, encoded):
+    started = time.perf_counter()
+    return hashers.check_password(password, encoded), time.perf_counter() - started
+
+
+class PasswordHasher:
+    """
+    Hash and check passwords in a pool of worker processes.
+
+    PBKDF2 is deliberately slow, so running it on the request threads lets
+    a burst of logins or signups take every CPU of the server. Here at most
+    `WORKERS` processes hash, and at most `MAX_CONCURRENCY` hashes may be
+    queued or running in this process; callers that cannot get a slot
+    within `QUEUE_TIMEOUT` seconds get a PasswordHashingBusy (503) instead
+    of piling up and holding request threads. Workers run with a lower
+    CPU priority (`NICENESS`), so requests sharing the CPUs go first. The
+    time spent waiting for a slot and for a worker is recorded as the queue
+    time. A hash that takes longer than `TIMEOUT` seconds is answered with
+    a PasswordHashingBusy as well. When a worker dies, the pool is replaced
+    and the hash retried once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._processes = None
+        self._slots = None
+        self.reset_stats()
+
+    @property
+    def config(self):
+        return settings.PASSWORD_HASHING
+
+    def make_password(self, password):
+        return self.run(timed_make_password, password)
+
+    def check_password(self, password, encoded):
+        return self.run(timed_check_password, password, encoded)
+
+    def make_passwords(self, passwords):
+        """
+        Hash many passwords, each one as its own task taking its own
+        concurrency slot. At most `WORKERS` of them are in flight, so logins
+        and signups interleave with the batch instead of queueing behind it.
+
+        The batch may wait for slots until `BATCH_TIMEOUT` seconds after it
+        started, rather than `QUEUE_TIMEOUT` per hash. Passwords not hashed
+        by then come back as None, while the hashes already done are kept.
+        """
+        if not self.config['WORKERS']:
+            return [timed_make_password(password)[0] for password in passwords]
+
+        deadline = time.monotonic() + self.config['BATCH_TIMEOUT']
+
+        def make_password(password):
+            queue_timeout = deadline - time.monotonic()
+            if queue_timeout <= 0:
+                return None
+            try:
+                return self.run(timed_make_password, password, queue_timeout=queue_timeout)
+            except PasswordHashingBusy:
+                return None
+
+        threads = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.config['WORKERS'], thread_name_prefix='password-hashing')
+        try:
+            return list(threads.map(make_password, passwords))
+        finally:
+            threads.shutdown(wait=True, cancel_futures=True)
+
+    def run(self, function, *args, queue_timeout=None):
+        """
+        Run `function` in a worker and return its result, or in the calling
+        thread when no worker is configured. `queue_timeout` overrides the
+        `QUEUE_TIMEOUT` wait for a slot.
+        """
+        if not self.config['WORKERS']:
+            return function(*args)[0]
+
+        if queue_timeout is None:
+            queue_timeout = self.config['QUEUE_TIMEOUT']
+        started = time.perf_counter()
+        slots = self._get_slots()
+        if not slots.acquire(timeout=queue_timeout):
+            self._record(rejected=True)
+            raise PasswordHashingBusy()
+        try:
+            result, duration = self._call(function, *args)
+        finally:
+            slots.release()
+        self._record(queue_time=time.perf_counter() - started - duration)
+        return result
+
+    def stats(self):
+        """
+        Return the number of hashes run and rejected, and their average and
+        maximum queue time in seconds.
+        """
+        with self._lock:
+            return {
+                'hashed': self.hashed,
+                'rejected': self.rejected,
+                'queue_time_avg': self.queue_time_total / self.hashed if self.hashed else 0,
+                'queue_time_max': self.queue_time_max,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hashed = 0
+            self.rejected = 0
+            self.queue_time_total = 0
+            self.queue_time_max = 0
+
+    def shutdown(self):
+        with self._lock:
+            processes, self._processes = self._processes, None
+        if processes is not None:
+            processes.shutdown(wait=True)
+
+    def _call(self, function, *args):
+        """
+        Run `function` in a worker, replacing the pool once if it broke.
+        """
+        for _ in range(2):
+            processes = self._get_processes()
+            try:
+                future = processes.submit(function, *args)
+                return future.result(timeout=self.config['TIMEOUT'])
+            except BrokenProcessPool:
+                # A worker died (OOM kill, signal): every later call would
+                # fail with this pool.
+                self._discard_processes(processes)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                self._record(rejected=True)
+                raise PasswordHashingBusy()
+        self._record(rejected=True)
+        raise PasswordHashingBusy()
+
+    def _discard_processes(self, processes):
+        with self._lock:
+            if self._processes is processes:
+                self._processes = None
+        processes.shutdown(wait=False, cancel_futures=True)
+
+    def _record(self, queue_time=0, count=1, rejected=False):
+        with self._lock:
+            if rejected:
+                self.rejected += count
+                return
+            self.hashed += count
+            self.queue_time_total += queue_time * count
+            self.queue_time_max = max(self.queue_time_max, queue_time)
+
+    def _get_slots(self):
+        with self._lock:
+            if self._slots is None:
+                self._slots = threading.BoundedSemaphore(self.config['MAX_CONCURRENCY'])
+            return self._slots
+
+    def _get_processes(self):
+        with self._lock:
+            if self._processes is None:
+                self._processes = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.config['WORKERS'],
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=configure_worker,
+                    initargs=(os.environ['DJANGO_SETTINGS_MODULE'], self.config['NICENESS']),
+                )
+                atexit.register(self.shutdown)
+            return self._processes
+
+
+password_hasher = PasswordHasher()
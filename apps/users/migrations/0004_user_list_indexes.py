@@ -0,0 +1,27 @@
+# Generated by Django 5.0.4 on 2026-10-17 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0003_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['created_at', 'id'], name='user_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['email'], name='user_email_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -1,7 +1,8 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 
 from apps.default.models.base_model import BaseModel
+from apps.users.cache.user_cache import user_cache
 from apps.users.models.user_manager import CustomUserManager
 
 
@@ -21,8 +22,39 @@ class User(AbstractUser, BaseModel):
 
     objects = CustomUserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='user_active_created_idx',
+            ),
+            # The unique index on email cannot serve `LIKE 'prefix%'` under
+            # a non-C collation; the pattern operator class can.
+            models.Index(
+                fields=['email'],
+                opclasses=['varchar_pattern_ops'],
+                condition=models.Q(is_active=True),
+                name='user_email_prefix_idx',
+            ),
+        ]
+
     def __str__(self):
         return f'{self.email}'
 
     def save(self, *args, **kwargs):
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        self.invalidate_cache()
+        return result
+
+    def delete(self, *args, **kwargs):
+        self.invalidate_cache()
+        return super().delete(*args, **kwargs)
+
+    def invalidate_cache(self):
+        """
+        Drop the cached copy of this user, used to authenticate requests,
+        once the current transaction commits.
+        """
+        pk = self.pk
+        transaction.on_commit(lambda: user_cache.invalidate(pk))
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import BaseUserManager
 
+from apps.users.hashing.password_hasher import password_hasher
+
 
 class CustomUserManager(BaseUserManager):
     """Manager for users where email is the unique identifier for authentication instead of usernames."""
@@ -25,3 +27,54 @@ class CustomUserManager(BaseUserManager):
             raise ValueError('Superuser debe tener is_superuser=True.')
 
         return self.create_user(email, password, **extra_fields)
+
+    def provision(self, rows, batch_size=500):
+        """
+        Create many users at once.
+
+        `rows` maps row numbers to validated signup data (first name, last
+        name, email and raw password). Emails already taken, by an existing
+        user or an earlier row, are found with one query; the passwords of
+        the other rows are hashed by the hashing pool, interleaved with
+        logins, and the users inserted with `bulk_create` in batches. Rows
+        that lose a race with a concurrent signup for the same email are
+        skipped by the insert and reported like the other duplicates.
+
+        Returns a `(users, postponed)` tuple: `users` maps the row numbers to
+        the created user, or to None when the email was taken; `postponed`
+        lists the rows whose password the pool did not hash in time, which
+        were not created.
+        """
+        taken = set(self.filter(
+            email__in=[data['email'] for data in rows.values()]
+        ).values_list('email', flat=True))
+
+        users = {}
+        for number, data in rows.items():
+            if data['email'] in taken:
+                users[number] = None
+                continue
+            taken.add(data['email'])
+            users[number] = self.model(**{
+                field: value for field, value in data.items() if field != 'password'})
+
+        new = [number for number, user in users.items() if user is not None]
+        passwords = password_hasher.make_passwords([rows[number]['password'] for number in new])
+        postponed = []
+        for number, password in zip(new, passwords):
+            if password is None:
+                # Hashed rows are kept; the others are left to a retry.
+                postponed.append(number)
+                del users[number]
+            else:
+                users[number].password = password
+
+        new = [number for number in new if number in users]
+        self.bulk_create([users[number] for number in new], batch_size=batch_size,
+                         ignore_conflicts=True)
+        created = set(self.filter(
+            pk__in=[users[number].pk for number in new]).values_list('pk', flat=True))
+        return {
+            number: user if user is not None and user.pk in created else None
+            for number, user in users.items()
+        }, postponed
@@ -0,0 +1,5 @@
+from rest_framework import serializers
+
+
+class UserFilterSerializer(serializers.Serializer):
+    email_prefix = serializers.CharField(required=False, max_length=255)
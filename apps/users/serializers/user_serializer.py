@@ -1,10 +1,12 @@
-from django.contrib.auth.hashers import make_password
+from django.conf import settings
 from rest_framework import serializers
 
+from apps.default.serializers.dynamic_fields_serializer import DynamicFieldsModelSerializer
+from apps.users.hashing.password_hasher import password_hasher
 from apps.users.models.user import User
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsModelSerializer):
 
     class Meta:
         model = User
@@ -31,7 +33,29 @@ class UserCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         password = validated_data.get('password')
-        hashed_password = make_password(password)
+        hashed_password = password_hasher.make_password(password)
         validated_data['password'] = hashed_password
         user = super(UserCreateSerializer, self).create(validated_data)
         return user
+
+
+class UserProvisionSerializer(UserCreateSerializer):
+    """
+    Signup rules for one row of a bulk creation. Email uniqueness is left
+    to `CustomUserManager.provision`, which checks all the rows at once.
+    """
+    class Meta(UserCreateSerializer.Meta):
+        extra_kwargs = {
+            'password': {'write_only': True},
+            'email': {'validators': []},
+        }
+
+
+class UserBulkCreateSerializer(serializers.Serializer):
+    users = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+    def validate_users(self, users):
+        max_users = settings.USER_BULK_CREATE['MAX_USERS']
+        if len(users) > max_users:
+            raise serializers.ValidationError(f"At most {max_users} users per request.")
+        return users
@@ -1,4 +1,9 @@
-from django.test import Client, TransactionTestCase
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from rest_framework import status
 
@@ -31,10 +36,76 @@ class UserViewSetTest(TransactionTestCase):
         response = self.client.get('/user/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Verificar que los datos de los usuarios son correctos
-        self.assertGreater(len(response.data), 0)
+        self.assertGreater(len(response.data['results']), 0)
         # Verificar que se devuelven los campos esperados
-        self.assertIn('id', response.data[0])
-        self.assertIn('email', response.data[0])
+        self.assertIn('id', response.data['results'][0])
+        self.assertIn('email', response.data['results'][0])
+
+    def test_list_users_sparse_fields(self):
+        """
+        Test listing users restricted to some fields.
+        """
+        response = self.client.get('/user/?fields=id,email')
+        self.assertEqual(response.data['results'][0],
+                         {'id': str(self.user.id), 'email': self.user.email})
+
+        response = self.client.get('/user/?fields=password')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_async_list_users(self):
+        """
+        Test that the async user list answers like the DRF one.
+        """
+        for query in ('', '?fields=id,email'):
+            expected = await sync_to_async(self.client.get)(f'/user/{query}')
+            response = await self.async_client.get(f'/async/user/{query}')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json(), expected.json())
+
+        response = await self.async_client.get(f'/async/user/{query}',
+                                               headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_users_paginated_and_filtered(self):
+        """
+        Test paging through users filtered on an email prefix.
+        """
+        for index in range(3):
+            User.objects.create_user(email=f'partner-{index}@example.com', password=None,
+                                     first_name="Partner", last_name=str(index))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/user/?email_prefix=partner-&page_size=2')
+        self.assertNotIn('"password"', queries[-1]['sql'])
+        emails = [user['email'] for user in response.data['results']]
+        response = self.client.get(response.data['next'])
+        emails += [user['email'] for user in response.data['results']]
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(emails, [f'partner-{index}@example.com' for index in range(3)])
+
+    def test_list_users_not_modified(self):
+        """
+        Test that an unchanged user list is answered with a 304.
+        """
+        other = User.objects.create_user(email='other@example.com', password=None,
+                                         first_name="Other", last_name="User")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/user/')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        # The validators come from the page rows, not from the whole table.
+        self.assertFalse([query for query in queries if 'MAX(' in query['sql']])
+        response = self.client.get('/user/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        User.objects.filter(pk=self.user.pk).update(first_name="Changed", updated_at=timezone.now())
+        response = self.client.get('/user/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response['ETag']
+        User.objects.filter(pk=other.pk).update(is_active=False)
+        response = self.client.get('/user/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
 
     def test_create_user(self):
         """
@@ -74,3 +145,56 @@ class UserViewSetTest(TransactionTestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         with self.assertRaises(User.DoesNotExist):
             User.objects.get(pk=self.user.id)
+
+    def test_bulk_create_users(self):
+        """
+        Test creating users in bulk with per-row results.
+        """
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        token = self.client.post('/authentication/login/', {
+            "email": self.user_data["email"], "password": self.user_data["password"],
+        }, content_type='application/json').data['access']
+        rows = [
+            {"first_name": "Ada", "last_name": "One", "email": "ada@example.com", "password": "secret-1"},
+            {"first_name": "Bad", "last_name": "Email", "email": "not-an-email", "password": "secret-2"},
+            {"first_name": "Old", "last_name": "User", "email": self.user_data["email"], "password": "secret-3"},
+            {"first_name": "Ada", "last_name": "Two", "email": "ada@example.com", "password": "secret-4"},
+            {"first_name": "Bo", "last_name": "Three", "email": "bo@example.com", "password": "secret-5"},
+        ]
+        response = self.client.post('/user/bulk_create_users/', data={"users": rows},
+                                    content_type='application/json',
+                                    HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 3))
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['created', 'invalid', 'duplicate', 'duplicate', 'created'])
+        self.assertTrue(User.objects.get(email="ada@example.com").check_password("secret-1"))
+
+    def test_bulk_create_users_postpones_unhashed_rows(self):
+        """
+        Test that rows the hashing pool did not reach in time come back
+        with a retry status and are not created.
+        """
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        token = self.client.post('/authentication/login/', {
+            "email": self.user_data["email"], "password": self.user_data["password"],
+        }, content_type='application/json').data['access']
+        rows = [{"first_name": "Ada", "last_name": "One", "email": "ada@example.com",
+                 "password": "secret-1"}]
+        with override_settings(PASSWORD_HASHING={**settings.PASSWORD_HASHING,
+                                                 'WORKERS': 1, 'BATCH_TIMEOUT': 0}):
+            response = self.client.post('/user/bulk_create_users/', data={"users": rows},
+                                        content_type='application/json',
+                                        HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual([result['status'] for result in response.data['results']], ['retry'])
+        self.assertFalse(User.objects.filter(email="ada@example.com").exists())
+
+    def test_bulk_create_users_requires_staff(self):
+        token = self.client.post('/authentication/login/', {
+            "email": self.user_data["email"], "password": self.user_data["password"],
+        }, content_type='application/json').data['access']
+        response = self.client.post('/user/bulk_create_users/', data={"users": [{}]},
+                                    content_type='application/json',
+                                    HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
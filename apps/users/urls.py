@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework import routers
 
+from apps.users.views.user_async_view import UserListAsyncView
 from apps.users.views.user_view import UserViewSet
 
 router = routers.DefaultRouter()
@@ -9,4 +10,5 @@ router.register(r'user', UserViewSet, basename='user')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('async/user/', UserListAsyncView.as_view(), name='user-async-list'),
 ]
@@ -0,0 +1,41 @@
+from apps.default.pagination.keyset_pagination import KeysetPagination
+from apps.default.views.async_api_view import AsyncAPIView
+from apps.default.views.conditional_view import ConditionalGetMixin
+from apps.default.views.sparse_fieldset_view import SparseFieldsetMixin
+from apps.users.filters.user_filter import UserFilterBackend
+from apps.users.models.user import User
+from apps.users.serializers.user_serializer import UserSerializer
+
+
+class UserListAsyncView(ConditionalGetMixin, SparseFieldsetMixin, AsyncAPIView):
+    """
+    Async user list: same query params, pages and validators as `GET /user/`.
+    """
+    queryset = User.objects.filter(is_active=True)
+    action = 'list'
+    filter_backends = [UserFilterBackend]
+    pagination_class = KeysetPagination
+
+    def get_serializer_class(self):
+        return UserSerializer
+
+    async def get(self, request):
+        self.get_requested_fields()
+        queryset = self.queryset.all()
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(self.request, queryset, self)
+
+        paginator = self.pagination_class()
+        fields = self.get_requested_fields()
+        page = await paginator.apaginate_queryset(
+            queryset.only(*(fields or UserSerializer.Meta.fields), *paginator.ordering,
+                          'updated_at'),
+            self.request, self)
+        last_modified, fingerprint = self.get_page_validators(page, paginator)
+        return await self.aconditional_response(
+            self.request, last_modified, fingerprint,
+            lambda: self.render_page(page, paginator, fields))
+
+    async def render_page(self, page, paginator, fields):
+        serializer = UserSerializer(page, many=True, fields=fields)
+        return self.render(paginator.get_paginated_response(serializer.data).data)
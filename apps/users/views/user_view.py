@@ -1,22 +1,33 @@
+from django.conf import settings
+
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound
 from rest_framework.permissions import (
+    IsAdminUser,
     IsAuthenticated,
     AllowAny
 )
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from apps.default.pagination.keyset_pagination import KeysetPagination
+from apps.default.views.conditional_view import ConditionalGetMixin
+from apps.default.views.sparse_fieldset_view import SparseFieldsetMixin
+from apps.users.filters.user_filter import UserFilterBackend
 from apps.users.models.user import User
 from apps.users.serializers.user_serializer import (
+    UserBulkCreateSerializer,
     UserCreateSerializer,
+    UserProvisionSerializer,
     UserSerializer
 )
 
 
-class UserViewSet(GenericViewSet):
+class UserViewSet(ConditionalGetMixin, SparseFieldsetMixin, GenericViewSet):
     queryset = User.objects.filter(is_active=True)
+    pagination_class = KeysetPagination
+    filter_backends = [UserFilterBackend]
 
     def get_permission_classes(self):
         if self.action == 'create_user':
@@ -38,25 +49,64 @@ class UserViewSet(GenericViewSet):
 
     def list(self, request):
         """
-        List all users.
+        List users, one page at a time, ordered by creation date.
+
+        Follow the `next` and `previous` links to move between pages; they
+        keep the filter of the first page. Only the serialized columns are
+        loaded.
+
+        Responses carry `ETag` and `Last-Modified` headers; send them back in
+        `If-None-Match`/`If-Modified-Since` to get a 304 while nothing changed.
 
         ---
+        Query params:
+            cursor: Opaque cursor taken from a `next`/`previous` link.
+            page_size: Number of users per page, capped by the server.
+            fields: Comma separated fields to return, e.g. `id,email`.
+            email_prefix: Only users whose email starts with this text
+                (case sensitive).
+
         response:
-            Response: Serialized data of all users.
+            200 OK: A page of serialized users.
             Example JSON:
-            {
-                "data": [
-                    {
-                        "id": "str",
-                        "email": "str",
-                    },
-                    ...
-                ]
-            }
+                {
+                    "next": "url",
+                    "previous": "url",
+                    "results": [
+                        {
+                            "id": "str",
+                            "first_name": "str",
+                            "last_name": "str",
+                            "email": "str"
+                        },
+                        ...
+                    ]
+                }
+            304 Not Modified: The client copy of the page is current.
+            400 Bad Request: Unknown fields requested, or invalid filter.
+            404 Not Found: Invalid cursor.
+        """
+        self.get_requested_fields()
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(self.get_list_queryset(queryset))
+        last_modified, fingerprint = self.get_page_validators(page, self.paginator)
+        return self.conditional_response(
+            request, last_modified, fingerprint,
+            lambda: Response(self.get_page_data(page), status=status.HTTP_200_OK)
+        )
+
+    def get_page_data(self, page):
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data).data
+
+    def get_list_queryset(self, queryset):
+        """
+        Load only the serialized columns, the ordering ones and `updated_at`
+        for the validators, never the password and the other AbstractUser
+        columns.
         """
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        fields = self.get_requested_fields() or UserSerializer.Meta.fields
+        return queryset.only(*fields, *KeysetPagination.ordering, 'updated_at')
 
     @action(detail=False, methods=['post'])
     def create_user(self, request):
@@ -93,6 +143,82 @@ class UserViewSet(GenericViewSet):
             "email": user.email
         }, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk_create_users(self, request):
+        """
+        Creates many users at once, e.g. to migrate partner accounts.
+
+        Only staff users can perform this action. Every row is validated
+        like a `create_user` body; emails already taken, by existing users
+        or by earlier rows, are reported as duplicates. Valid rows are
+        created with their passwords hashed in the shared hashing pool,
+        interleaved with logins, and every row gets a result. Rows the pool
+        could not hash within the time budget of the request come back with
+        a `retry` status and were not created; send them again. Up to
+        `USER_BULK_CREATE['MAX_USERS']` (5000) users per request. Rows are
+        numbered from 1.
+
+        ---
+        Body:
+            {
+                "users": [
+                    {
+                        "first_name": "str",
+                        "last_name": "str",
+                        "email": "str",
+                        "password": "str"
+                    },
+                    ...
+                ]
+            }
+
+        responses:
+            200 OK: Rows processed.
+            Example JSON:
+                {
+                    "created": <int>,
+                    "failed": <int>,
+                    "results": [
+                        {"row": 1, "status": "created", "id": "user_id"},
+                        {"row": 2, "status": "invalid", "errors": {"email": ["Enter a valid email address."]}},
+                        {"row": 3, "status": "duplicate", "errors": {"email": ["A user with this email already exists."]}},
+                        {"row": 4, "status": "retry", "errors": {"password": ["The server is busy hashing passwords, send this row again."]}},
+                        ...
+                    ]
+                }
+            400 Bad Request: Missing or empty `users`, or too many of them.
+            403 Forbidden: The user is not staff.
+        """
+        serializer = UserBulkCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results, rows = {}, {}
+        for number, data in enumerate(serializer.validated_data['users'], start=1):
+            row = UserProvisionSerializer(data=data)
+            if row.is_valid():
+                rows[number] = row.validated_data
+            else:
+                results[number] = {"row": number, "status": "invalid", "errors": row.errors}
+
+        users, postponed = User.objects.provision(
+            rows, batch_size=settings.USER_BULK_CREATE['BATCH_SIZE'])
+        for number in postponed:
+            results[number] = {"row": number, "status": "retry", "errors": {
+                "password": ["The server is busy hashing passwords, send this row again."]}}
+        for number, user in users.items():
+            if user is None:
+                results[number] = {"row": number, "status": "duplicate", "errors": {
+                    "email": ["A user with this email already exists."]}}
+            else:
+                results[number] = {"row": number, "status": "created", "id": user.id}
+
+        created = sum(user is not None for user in users.values())
+        return Response({
+            "created": created,
+            "failed": len(results) - created,
+            "results": [results[number] for number in sorted(results)],
+        }, status=status.HTTP_200_OK)
+
     def partial_update(self, request, pk=None):
         """
         Partially updates a user.
@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'technical_challenge.settings')
 
 application = get_asgi_application()
+
+from apps.authentication.tokens.blacklist_filter import blacklist_filter  # noqa: E402
+
+# Load the token blacklist filter before serving, instead of in the first
+# refresh or logout request of the process.
+blacklist_filter.warm()
@@ -64,10 +64,60 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.authentication.backends.cached_jwt_authentication.CachedJWTAuthentication',
     ],
 }
 
+KEYSET_PAGINATION = {
+    'PAGE_SIZE': 50,
+    'MAX_PAGE_SIZE': 200,
+}
+
+# Render product list pages from `.values()` rows instead of model instances
+# and ProductSerializer. The JSON output is the same.
+PRODUCT_FAST_LIST_SERIALIZATION = False
+
+# Bulk product imports insert BATCH_SIZE rows per query (clients may ask
+# for up to MAX_BATCH_SIZE) and report at most MAX_ERRORS invalid rows.
+PRODUCT_IMPORT = {
+    'BATCH_SIZE': 500,
+    'MAX_BATCH_SIZE': 5000,
+    'MAX_ERRORS': 1000,
+}
+
+# Seconds a stock reservation holds its units before the sweeper
+# (release_reservations) returns them to stock.
+PRODUCT_RESERVATION = {
+    'TTL': 600,
+}
+
+# Catalog exports read and render CHUNK_SIZE rows at a time.
+PRODUCT_EXPORT = {
+    'CHUNK_SIZE': 2000,
+}
+
+# Resized copies generated in the background for every uploaded product
+# image. SIZES maps a name to the longest side in pixels; WORKERS bounds the
+# Pillow worker processes.
+PRODUCT_IMAGE_DERIVATIVES = {
+    'SIZES': {'thumbnail': 160, 'medium': 640, 'large': 1280},
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 80,
+    'DIRECTORY': 'product_image/derivatives',
+    'WORKERS': 2,
+}
+
+# Writes sent with an Idempotency-Key header store their result in the
+# IdempotencyKey table for TTL seconds and replay it to retries. A retry that
+# arrives while the first request still runs waits up to WAIT seconds for
+# its result. `purge_idempotency_keys` deletes the expired keys, and then the
+# oldest ones beyond MAX_KEYS, whose retries run again instead of replaying.
+IDEMPOTENCY = {
+    'TTL': 86400,
+    'WAIT': 10,
+    'MAX_KEYS': 1000000,
+}
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -75,6 +125,40 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
     "UPDATE_LAST_LOGIN": False,
+    "TOKEN_REFRESH_SERIALIZER": "apps.authentication.serializers.authentication_serializer.FilteredTokenRefreshSerializer",
+}
+
+# Login and signup hash passwords in WORKERS processes per server process,
+# niced by NICENESS, so a burst of them cannot pin the request threads and
+# CPUs. At most MAX_CONCURRENCY hashes wait or run at once; a request that
+# gets no slot within QUEUE_TIMEOUT seconds, or whose hash takes over
+# TIMEOUT seconds, is answered 503. WORKERS 0 hashes on the request thread.
+# A bulk hash waits for slots up to BATCH_TIMEOUT seconds in total and leaves
+# the passwords it did not reach by then unhashed.
+PASSWORD_HASHING = {
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', 2)),
+    'MAX_CONCURRENCY': 4,
+    'QUEUE_TIMEOUT': 1,
+    'BATCH_TIMEOUT': 30,
+    'TIMEOUT': 10,
+    'NICENESS': 10,
+}
+
+# Bulk user creation accepts at most MAX_USERS users per request and inserts
+# them BATCH_SIZE rows per query. Every password costs a PBKDF2 hash in the
+# shared hashing pool; the rows not hashed within PASSWORD_HASHING's
+# BATCH_TIMEOUT are answered with a `retry` status for the client to resend.
+USER_BULK_CREATE = {
+    'MAX_USERS': 5000,
+    'BATCH_SIZE': 500,
+}
+
+# Bloom filter of the blacklisted refresh tokens kept by every process, sized
+# for CAPACITY tokens with a false positive rate of ERROR_RATE (about 1.8MB
+# for the defaults). It grows when the blacklist outgrows it.
+TOKEN_BLACKLIST_FILTER = {
+    'CAPACITY': 1_000_000,
+    'ERROR_RATE': 0.001,
 }
 
 MIDDLEWARE = [
@@ -124,6 +208,41 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+#
+# The local-memory backend is a per-process LRU cache, so invalidations only
+# reach the process that performed the write; the TIMEOUT bounds how long
+# other processes may serve a stale payload. Management commands run in a
+# process of their own, so the product writes of imports, shard and purchase
+# queue upkeep and reservation expiry only show up once the 'products'
+# TIMEOUT has passed. Point the aliases at a shared backend (Redis,
+# Memcached) to make invalidation global.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'products': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'products',
+        'TIMEOUT': 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Users resolved from access tokens. The short TIMEOUT bounds how long
+    # a process that did not see an update keeps authenticating the old user.
+    'users': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'users',
+        'TIMEOUT': 30,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 